@@ -1,26 +1,41 @@
 from dotenv import load_dotenv
-from fastapi import FastAPI, Response, HTTPException, status, Depends
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, Request, Response, HTTPException, status, Depends
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from fastapi.staticfiles import StaticFiles
 from .schemas import ChatRequest, SessionRequest, TestCreate, TestResponse, ReportCreate, ReportResponse, BatchAgentRequest
 from .utils.prompt import convert_to_chat_messages
 from .models import ModelConfig
-from .plugins import WebAgentType, get_web_agent, AGENT_CONFIGS
+from .plugins import WebAgentType, get_web_agent, AGENT_CONFIGS_JSON
+from .plugins.browser_use import browser_use_agent_batch
+from .plugins.browser_use.agent import (
+    controller,
+    resume_execution,
+    ResumeRequest,
+    pause_execution_manually,
+    PauseRequest,
+    release_session_state,
+    STATIC_DIR,
+)
 from .streamer import stream_vercel_format
 from api.middleware.profiling_middleware import ProfilingMiddleware
+from api.middleware.cors_middleware import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional, Union
+from cachetools import TTLCache
 import os
 import asyncio
+import functools
 import subprocess
 import re
 import time
 import logging
-from datetime import datetime
+import hashlib
+import uuid
+import random
+from datetime import datetime, timezone
 from .utils.types import AgentSettings
+from langchain_core.messages import AIMessage
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # 1) Import the Steel client
@@ -32,11 +47,28 @@ except ImportError:
 
 load_dotenv(".env.local")
 
+# Set up logging. basicConfig is a no-op once another module has configured
+# the root logger, so the level is applied to the root logger directly.
+# Set LOG_LEVEL=WARNING in production to drop per-request INFO records.
+logging.basicConfig()
+logging.getLogger().setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+
 # Log the environment variables for debugging (excluding sensitive info)
 port = os.environ.get("PORT", "8000")
-logger.info(f"Starting server on port: {port}")
+logger.info("Starting server on port: %s", port)
+
+def _uuid7_fallback() -> uuid.UUID:
+    """UUIDv7 (RFC 9562) for Python < 3.14: 48-bit ms timestamp + 74 random bits."""
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # variant
+    return uuid.UUID(int=value)
+
 
-app = FastAPI()
+# Time-sortable, collision-free IDs for tests and reports
+uuid7 = getattr(uuid, "uuid7", _uuid7_fallback)
+
+app = FastAPI(default_response_class=ORJSONResponse)
 app.add_middleware(ProfilingMiddleware) # Uncomment this when profiling is not needed
 STEEL_API_KEY = os.getenv("STEEL_API_KEY")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
@@ -46,29 +78,57 @@ STEEL_API_URL = os.getenv("STEEL_API_URL")
 #    Make sure your STEEL_API_KEY is set as an environment variable
 steel_client = Steel(steel_api_key=STEEL_API_KEY, base_url=STEEL_API_URL)
 
-# Add a session locks mechanism to prevent multiple resume requests
-session_locks: Dict[str, asyncio.Lock] = {}
-session_last_resume: Dict[str, float] = {}
+# Sessions with a resume request in progress; later requests for them return early.
+# The check and the add run without an await between them, so no lock is needed.
+_resumes_in_flight: set = set()
 RESUME_COOLDOWN = 1.0  # seconds
-
-# Keep track of batch job status
-batch_job_status: Dict[str, Dict[str, Any]] = {}
-
-origins = [
+_RESUME_MAX_ATTEMPTS = 2
+# Returned (as a fresh copy with a timestamp) when a resume is skipped
+_RESUME_IN_PROGRESS = {
+    "status": "success",
+    "message": "Resume already in progress",
+    "is_resumed": True,
+}
+# Resume timestamps only matter for the cooldown window, so they expire on their own
+session_last_resume: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+
+
+def _resume_backoff(attempt: int) -> float:
+    """Exponential backoff with jitter so concurrent failed resumes don't retry in lockstep."""
+    return random.uniform(0.1, 0.3) * (1 << attempt)
+
+
+# Keep track of batch job status. Bounded so finished jobs don't accumulate
+# forever; entries are only mutated between awaits, so no lock is needed.
+batch_job_status: TTLCache = TTLCache(maxsize=10_000, ttl=86_400)
+# Strong references to streamed batch jobs so they aren't garbage collected mid-run
+_batch_jobs: set = set()
+_BATCH_PROGRESS_INTERVAL = 15.0  # seconds between progress messages
+_BATCH_REPORT_CHUNK_SIZE = 16 * 1024  # characters per streamed report chunk
+
+origins = frozenset({
     "http://localhost",
     "http://localhost:3000",
     "http://localhost:8080",
     "https://bugzer.bugzer.workers.dev",
     "http://localhost:3001",
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+})
+
+# Added after ProfilingMiddleware so CORS stays the outermost layer
+app.add_middleware(CORSMiddleware, allow_origins=origins)
+
+
+class _ImmutableStaticFiles(StaticFiles):
+    """Static files whose URLs carry a content digest, so clients may cache them for good."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+# Under /api so the frontend's /api/* rewrite reaches it
+app.mount("/api/static", _ImmutableStaticFiles(directory=STATIC_DIR), name="static")
 
 @app.get("/", tags=["Health"])
 async def root_health_check():
@@ -83,7 +143,6 @@ async def create_session(request: SessionRequest):
     """
     Creates a new session.
     """
-    # Create a regular session for all agent types (since CLAUDE_COMPUTER_USE was removed)
     return steel_client.sessions.create(
         api_timeout=request.timeout * 1000,
     )
@@ -94,6 +153,7 @@ async def release_session(session_id: str):
     """
     Releases a session. Returns success even if session is already released.
     """
+    await release_session_state(session_id)
     try:
         return steel_client.sessions.release(session_id)
     except Exception as e:
@@ -107,90 +167,56 @@ async def resume_session(session_id: str):
     """
     Resume execution for a paused session.
     """
-    from .plugins.browser_use.agent import resume_execution, ResumeRequest
-
     # Check if this session was recently resumed
-    now = time.time()
-    if session_id in session_last_resume:
-        time_since_last_resume = now - session_last_resume[session_id]
-        if time_since_last_resume < RESUME_COOLDOWN:
-            # Too soon - return success but don't actually resume again
-            return {
-                "status": "success", 
-                "message": f"Resume already in progress", 
-                "is_resumed": True, 
-                "timestamp": now
-            }
+    now = time.monotonic()
+    last_resume = session_last_resume.get(session_id)
+    if last_resume is not None and now - last_resume < RESUME_COOLDOWN:
+        # Too soon - return success but don't actually resume again
+        return {**_RESUME_IN_PROGRESS, "timestamp": time.time()}
+
+    # If another request for this session is mid-resume, don't queue behind it
+    if session_id in _resumes_in_flight:
+        return {**_RESUME_IN_PROGRESS, "timestamp": time.time()}
+
+    _resumes_in_flight.add(session_id)
+    # Update last resume timestamp
+    session_last_resume[session_id] = now
 
-    # Create a lock for this session if it doesn't exist
-    if session_id not in session_locks:
-        session_locks[session_id] = asyncio.Lock()
-    
-    # Try to acquire the lock with a timeout
     try:
-        # Use a timeout to prevent deadlocks
-        lock_acquired = await asyncio.wait_for(
-            session_locks[session_id].acquire(), 
-            timeout=0.5
-        )
-        
-        if not lock_acquired:
-            # If we couldn't acquire the lock, someone else is already processing
-            return {
-                "status": "success", 
-                "message": "Resume already in progress", 
-                "is_resumed": True, 
-                "timestamp": now
-            }
-            
-        # Update last resume timestamp
-        session_last_resume[session_id] = now
-            
-        try:
-            # Make multiple attempts to resume the session in case the first one fails
-            max_attempts = 2
-            last_error = None
-            
-            for attempt in range(max_attempts):
-                try:
-                    result = await resume_execution(ResumeRequest(session_id=session_id))
-                    if result.get("status") == "success":
-                        result["is_resumed"] = True
-                        result["timestamp"] = now
-                        # If we were successful after a retry, log it
-                        if attempt > 0:
-                            print(f"Successfully resumed session {session_id} on attempt {attempt+1}")
-                        return result
-                    elif attempt < max_attempts - 1:
-                        # Wait briefly before retry
-                        await asyncio.sleep(0.2)
-                except Exception as e:
-                    last_error = e
-                    # Only sleep before retry if not the last attempt
-                    if attempt < max_attempts - 1:
-                        await asyncio.sleep(0.2)
-            
-            # If we got here, all attempts failed
-            if last_error:
-                raise last_error
-            return {
-                "status": "error",
-                "message": "Failed to resume session after multiple attempts",
-                "is_resumed": False
-            }
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-        finally:
-            # Always release the lock
-            session_locks[session_id].release()
-    except asyncio.TimeoutError:
-        # If we timed out waiting for the lock
+        # Make multiple attempts to resume the session in case the first one fails
+        last_error = None
+
+        for attempt in range(_RESUME_MAX_ATTEMPTS):
+            try:
+                result = await resume_execution(ResumeRequest(session_id=session_id))
+                if result.get("status") == "success":
+                    result["is_resumed"] = True
+                    result["timestamp"] = time.time()
+                    # If we were successful after a retry, log it
+                    if attempt > 0:
+                        logger.debug("Successfully resumed session %s on attempt %d", session_id, attempt + 1)
+                    return result
+                elif attempt < _RESUME_MAX_ATTEMPTS - 1:
+                    # Wait briefly before retry
+                    await asyncio.sleep(_resume_backoff(attempt))
+            except Exception as e:
+                last_error = e
+                # Only sleep before retry if not the last attempt
+                if attempt < _RESUME_MAX_ATTEMPTS - 1:
+                    await asyncio.sleep(_resume_backoff(attempt))
+
+        # If we got here, all attempts failed
+        if last_error:
+            raise last_error
         return {
-            "status": "success", 
-            "message": "Resume already in progress", 
-            "is_resumed": True, 
-            "timestamp": now
+            "status": "error",
+            "message": "Failed to resume session after multiple attempts",
+            "is_resumed": False
         }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        _resumes_in_flight.discard(session_id)
 
 
 @app.post("/api/sessions/{session_id}/pause", tags=["Sessions"])
@@ -198,8 +224,6 @@ async def pause_session(session_id: str):
     """
     Manually pause execution for a session to take control.
     """
-    from .plugins.browser_use.agent import pause_execution_manually, PauseRequest
-
     try:
         result = await pause_execution_manually(PauseRequest(session_id=session_id))
         return result
@@ -214,10 +238,10 @@ async def handle_chat(request: ChatRequest):
     """
     try:
         messages = request.messages
-        chat_messages = convert_to_chat_messages(messages)
+        last_message = messages[-1] if messages else None
 
         # Check for empty message, which might be causing the duplicated agent creation
-        if not messages or (len(messages) > 0 and messages[-1].content == ""):
+        if last_message is None or not last_message.content:
             logger.info("Received empty message request - not creating a new agent")
             return StreamingResponse(
                 stream_vercel_format(empty_stream()),
@@ -231,45 +255,20 @@ async def handle_chat(request: ChatRequest):
                 media_type="text/plain",
             )
             
-        # Import the controller here to avoid circular imports
-        from .plugins.browser_use.agent import controller
-        
         # Check if this session has a controller with a completed task
-        if controller.session_id == request.session_id and controller.finished:
-            logger.info(f"Agent already completed task for session {request.session_id} - not creating a new agent")
+        if controller.session_finished(request.session_id):
+            logger.info("Agent already completed task for session %s - not creating a new agent", request.session_id)
             return StreamingResponse(
                 stream_vercel_format(empty_stream()),
                 media_type="text/event-stream",
             )
-            
-        # Set the session ID on the controller
-        controller.session_id = request.session_id
-        controller.finished = False
-
-        model_config_args = {
-            "provider": request.provider,
-            "model_name": request.model_settings.model_choice,
-            "api_key": request.api_key,
-        }
 
-        if hasattr(request.model_settings, "temperature"):
-            model_config_args["temperature"] = request.model_settings.temperature
-        if hasattr(request.model_settings, "max_tokens"):
-            model_config_args["max_tokens"] = request.model_settings.max_tokens
-        if hasattr(request.model_settings, "top_p"):
-            model_config_args["top_p"] = request.model_settings.top_p
-        if hasattr(request.model_settings, "top_k"):
-            model_config_args["top_k"] = request.model_settings.top_k
-        if hasattr(request.model_settings, "frequency_penalty"):
-            model_config_args["frequency_penalty"] = (
-                request.model_settings.frequency_penalty
-            )
-        if hasattr(request.model_settings, "presence_penalty"):
-            model_config_args["presence_penalty"] = (
-                request.model_settings.presence_penalty
-            )
+        # Only convert once we know an agent will actually run
+        chat_messages = convert_to_chat_messages(messages)
 
-        model_config = ModelConfig(**model_config_args)
+        model_config = ModelConfig.from_request(
+            request.provider, request.model_settings, request.api_key
+        )
 
         web_agent = get_web_agent(request.agent_type)
 
@@ -314,12 +313,19 @@ async def handle_chat(request: ChatRequest):
             e, "code", 500), detail=error_response)
 
 
+_AGENTS_ETAG = f'"{hashlib.md5(AGENT_CONFIGS_JSON).hexdigest()}"'
+_AGENTS_HEADERS = {"ETag": _AGENTS_ETAG, "Cache-Control": "no-cache"}
+
+
 @app.get("/api/agents", tags=["Agents"])
-async def get_available_agents():
+async def get_available_agents(request: Request):
     """
     Returns all available agents and their configurations.
+    The JSON body is serialized once at import time.
     """
-    return AGENT_CONFIGS
+    if request.headers.get("if-none-match") == _AGENTS_ETAG:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_AGENTS_HEADERS)
+    return Response(content=AGENT_CONFIGS_JSON, media_type="application/json", headers=_AGENTS_HEADERS)
 
 
 @app.get("/healthcheck", tags=["System"])
@@ -341,22 +347,23 @@ async def create_test(
         # Create test data dictionary
         test_dict = test_data.model_dump()
         test_dict["user_id"] = user_id
-        test_dict["created_at"] = datetime.now().isoformat()
-        test_dict["updated_at"] = test_dict["created_at"]
+        now = datetime.now(timezone.utc)
+        test_dict["created_at"] = now
+        test_dict["updated_at"] = now
         
         # Generate a unique ID (in production this would be handled by the database)
-        test_id = f"test_{int(time.time())}_{user_id[:8]}"
+        test_id = f"test_{uuid7()}"
         test_dict["id"] = test_id
         
         # In a real implementation, this would be a database insert
         # For demo purposes, we'll just return the test data
         result = {"data": [test_dict]}
         
-        logger.info(f"Created test: {test_id}")
+        logger.info("Created test: %s", test_id)
         
         return TestResponse(**result["data"][0])
     except Exception as e:
-        logger.error(f"Failed to create test: {str(e)}")
+        logger.error("Failed to create test: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create test: {str(e)}"
@@ -377,35 +384,178 @@ async def create_report(
         # Create the report dictionary
         report_dict = report_data.model_dump()
         report_dict["user_id"] = user_id
-        report_dict["created_at"] = datetime.now().isoformat()
-        report_dict["updated_at"] = report_dict["created_at"]
+        now = datetime.now(timezone.utc)
+        report_dict["created_at"] = now
+        report_dict["updated_at"] = now
         
         # Generate a unique ID (in production this would be handled by the database)
-        report_id = f"report_{int(time.time())}_{user_id[:8]}"
+        report_id = f"report_{uuid7()}"
         report_dict["id"] = report_id
         
         # In a real implementation, this would be a database insert
         # For demo purposes, we'll just return the report data
         result = {"data": [report_dict]}
         
-        logger.info(f"Created report: {report_id} for test: {report_data.test_id}")
+        logger.info("Created report: %s for test: %s", report_id, report_data.test_id)
         
         return ReportResponse(**result["data"][0])
     except Exception as e:
-        logger.error(f"Failed to create report: {str(e)}")
+        logger.error("Failed to create report: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create report: {str(e)}"
         )
 
+async def _run_batch_job(
+    request: BatchAgentRequest, user_id: str, test_id: str, started_at: datetime
+) -> Dict[str, Any]:
+    """
+    Run the browser agent for an already created test, store the report and
+    update batch_job_status. Returns the response payload for the test.
+    """
+    # 2. Prepare agent execution
+    # Create a message with the URL as the content
+    messages = [{"role": "user", "content": f"Analyze the website at {request.url} and provide a detailed performance report."}]
+    chat_messages = convert_to_chat_messages(messages)
+
+    # Set up model and agent settings
+    model_config = ModelConfig(
+        provider=request.provider,
+        model_name=request.model_settings.model_choice,
+        temperature=request.model_settings.temperature
+    )
+
+    agent_settings = request.agent_settings or AgentSettings(steps=100)
+
+    # Create a unique session ID from the test ID
+    session_id = f"batch_{test_id}"
+
+    # Create a timeout mechanism
+    timeout = request.timeout or 300  # default 5 minutes
+
+    # 3. Run the agent with timeout
+    error_message = None
+    try:
+        # Update test status to "running"
+        # In a real implementation, this would update the database
+        logger.info("Starting batch agent for test: %s", test_id)
+
+        # Run the agent
+        async with asyncio.timeout(timeout):
+            report = await browser_use_agent_batch(
+                model_config=model_config,
+                agent_settings=agent_settings,
+                history=[{"role": "user", "content": request.description}],
+                session_id=session_id,
+            )
+    except TimeoutError:
+        error_message = f"Agent execution timed out after {timeout} seconds"
+        logger.error("Timeout for test: %s - %s", test_id, error_message)
+    except Exception as e:
+        error_message = f"Error during agent execution: {str(e)}"
+        logger.error("Error for test: %s - %s", test_id, error_message)
+
+    # 4. Create the report record, still creating one with the error on failure
+    succeeded = error_message is None
+    report_data = ReportCreate(
+        test_id=test_id,
+        content=report if succeeded else f"ERROR: {error_message}",
+        status="completed" if succeeded else "failed"
+    )
+
+    report_result = await create_report(report_data, user_id)
+
+    # 5. Update test status in a single write
+    # In a real implementation, this would update the database
+    batch_job_status[test_id] = {
+        "status": "completed" if succeeded else "failed",
+        "message": "Test completed successfully" if succeeded else error_message,
+        "started_at": started_at,
+        "completed_at": datetime.now(timezone.utc)
+    }
+
+    if not succeeded:
+        return {
+            "status": "error",
+            "test_id": test_id,
+            "report_id": report_result.id,
+            "message": error_message
+        }
+
+    logger.info("Batch agent completed successfully for test: %s", test_id)
+    return {
+        "status": "success",
+        "test_id": test_id,
+        "report_id": report_result.id,
+        "report": report
+    }
+
+
+def _batch_job_failed(test_id: str, started_at: datetime, job: asyncio.Task):
+    """
+    Done callback for streamed batch jobs: records a terminal "failed" status if the job
+    raised, whether or not the client is still connected.
+    """
+    if job.cancelled() or job.exception() is None:
+        return
+    logger.error("Batch job failed for test: %s - %s", test_id, job.exception())
+    batch_job_status[test_id] = {
+        "status": "failed",
+        "message": f"Batch job failed: {job.exception()}",
+        "started_at": started_at,
+        "completed_at": datetime.now(timezone.utc)
+    }
+
+
+async def _stream_batch_job(
+    request: BatchAgentRequest, user_id: str, test_id: str, started_at: datetime
+):
+    """
+    Yield progress messages while the batch job runs, then the report in
+    fixed-size chunks, for consumption by stream_vercel_format.
+    """
+    yield AIMessage(content=f"Started batch test {test_id} for {request.url}\n")
+
+    # The job keeps running (and records its status) if the client disconnects
+    job = asyncio.create_task(_run_batch_job(request, user_id, test_id, started_at))
+    _batch_jobs.add(job)
+    job.add_done_callback(_batch_jobs.discard)
+    job.add_done_callback(functools.partial(_batch_job_failed, test_id, started_at))
+
+    started = time.monotonic()
+    while True:
+        done, _ = await asyncio.wait((job,), timeout=_BATCH_PROGRESS_INTERVAL)
+        if done:
+            break
+        yield AIMessage(content=f"Still running ({int(time.monotonic() - started)}s elapsed)\n")
+
+    try:
+        result = job.result()
+    except Exception as e:
+        # The done callback has already recorded the failed status
+        yield AIMessage(content=f"ERROR: Batch job failed: {e}\n")
+        yield "END"
+        return
+    report = result.get("report")
+    if report is None:
+        yield AIMessage(content=f"ERROR: {result.get('message')}\n")
+    else:
+        for i in range(0, len(report), _BATCH_REPORT_CHUNK_SIZE):
+            yield AIMessage(content=report[i:i + _BATCH_REPORT_CHUNK_SIZE])
+    yield "END"
+
+
 @app.post("/api/batch/browser_agent", tags=["Agents"])
 async def run_browser_agent_batch(
     request: BatchAgentRequest,
+    http_request: Request,
     user_id: str = "demo_user" # In production this would use Depends(get_current_user)
 ):
     """
-    Run the browser agent in batch mode without streaming.
+    Run the browser agent in batch mode.
     Creates a test record, runs the agent, and stores the report.
+    Clients sending `Accept: text/event-stream` get progress and the report
+    streamed in the Vercel data stream format instead of a single JSON body.
     """
     try:
         # 1. Create a test record first
@@ -418,145 +568,25 @@ async def run_browser_agent_batch(
         # Create the test record
         test_result = await create_test(test_data, user_id)
         test_id = test_result.id
+        started_at = test_result.created_at
         
-        # Update batch job status
+        # Publish "running" for /api/batch/status pollers; the terminal write replaces it
         batch_job_status[test_id] = {
             "status": "running",
             "message": "Test initialized, running browser agent",
-            "started_at": datetime.now().isoformat()
+            "started_at": started_at
         }
         
-        # 2. Prepare agent execution
-        # Create a message with the URL as the content
-        messages = [{"role": "user", "content": f"Analyze the website at {request.url} and provide a detailed performance report."}]
-        chat_messages = convert_to_chat_messages(messages)
-        
-        # Set up model and agent settings
-        model_config = ModelConfig(
-            provider=request.provider,
-            model_name=request.model_settings.model_choice,
-            temperature=request.model_settings.temperature
-        )
-        
-        agent_settings = request.agent_settings or AgentSettings(steps=100)
-        
-        # Create a unique session ID from the test ID
-        session_id = f"batch_{test_id}"
-        
-        # Create a timeout mechanism
-        timeout = request.timeout or 300  # default 5 minutes
-        
-        # 3. Run the agent with timeout
-        try:
-            # Update test status to "running"
-            # In a real implementation, this would update the database
-            logger.info(f"Starting batch agent for test: {test_id}")
-            
-            # Import the batch agent function
-            from .plugins.browser_use import browser_use_agent_batch
-            
-            # Run the agent
-            report = await asyncio.wait_for(
-                browser_use_agent_batch(
-                    model_config=model_config,
-                    agent_settings=agent_settings,
-                    history=[{"role": "user", "content": request.description}],
-                    session_id=session_id,
-                ),
-                timeout=timeout
-            )
-            
-            # 4. Create the report record
-            report_data = ReportCreate(
-                test_id=test_id,
-                content=report,
-                status="completed"
-            )
-            
-            report_result = await create_report(report_data, user_id)
-            
-            # 5. Update test status to "completed"
-            # In a real implementation, this would update the database
-            logger.info(f"Batch agent completed successfully for test: {test_id}")
-            
-            # Update batch job status
-            batch_job_status[test_id] = {
-                "status": "completed",
-                "message": "Test completed successfully",
-                "completed_at": datetime.now().isoformat()
-            }
-            
-            return {
-                "status": "success",
-                "test_id": test_id,
-                "report_id": report_result.id,
-                "report": report
-            }
-            
-        except asyncio.TimeoutError:
-            # Handle timeout
-            error_message = f"Agent execution timed out after {timeout} seconds"
-            logger.error(f"Timeout for test: {test_id} - {error_message}")
-            
-            # Update test status to "failed"
-            # In a real implementation, this would update the database
-            
-            # Still create a report with the error
-            report_data = ReportCreate(
-                test_id=test_id,
-                content=f"ERROR: {error_message}",
-                status="failed"
-            )
-            
-            report_result = await create_report(report_data, user_id)
-            
-            # Update batch job status
-            batch_job_status[test_id] = {
-                "status": "failed",
-                "message": error_message,
-                "completed_at": datetime.now().isoformat()
-            }
-            
-            return {
-                "status": "error",
-                "test_id": test_id,
-                "report_id": report_result.id,
-                "message": error_message
-            }
-            
-        except Exception as e:
-            # Handle other exceptions
-            error_message = f"Error during agent execution: {str(e)}"
-            logger.error(f"Error for test: {test_id} - {error_message}")
-            
-            # Update test status to "failed"
-            # In a real implementation, this would update the database
-            
-            # Still create a report with the error
-            report_data = ReportCreate(
-                test_id=test_id,
-                content=f"ERROR: {error_message}",
-                status="failed"
-            )
-            
-            report_result = await create_report(report_data, user_id)
-            
-            # Update batch job status
-            batch_job_status[test_id] = {
-                "status": "failed",
-                "message": error_message,
-                "completed_at": datetime.now().isoformat()
-            }
-            
-            return {
-                "status": "error",
-                "test_id": test_id,
-                "report_id": report_result.id,
-                "message": error_message
-            }
-            
+        if "text/event-stream" in http_request.headers.get("accept", ""):
+            response = StreamingResponse(stream_vercel_format(_stream_batch_job(request, user_id, test_id, started_at)))
+            response.headers["x-vercel-ai-data-stream"] = "v1"
+            response.headers["x-test-id"] = test_id
+            return response
+
+        return await _run_batch_job(request, user_id, test_id, started_at)
+
     except Exception as e:
-        logger.error(f"Error in batch browser agent: {str(e)}")
+        logger.error("Error in batch browser agent: %s", e)
         return {
             "status": "error",
             "message": str(e)
@@ -573,14 +603,13 @@ async def check_batch_status(
     # In a real implementation, we would verify that the test belongs to the user
     # For demo purposes, we'll just check if the test exists in our status dictionary
     
-    if test_id not in batch_job_status:
+    status_data = batch_job_status.get(test_id)
+    if status_data is None:
         return {
             "status": "unknown",
             "message": "No batch job found for this test ID"
         }
     
-    status_data = batch_job_status[test_id]
-    
     # In a real implementation, we would include test and report data from the database
     
     return status_data
@@ -0,0 +1,81 @@
+from typing import Iterable
+
+_ALLOW_METHODS = b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+_TEXT_PLAIN = b"text/plain; charset=utf-8"
+
+
+class CORSMiddleware:
+    """
+    Pure ASGI CORS middleware for a fixed set of allowed origins.
+    Credentials, all methods and all headers are allowed, matching the
+    previous Starlette CORSMiddleware configuration. Origins are matched
+    with a single frozenset lookup on the raw header bytes.
+    """
+
+    def __init__(self, app, allow_origins: Iterable[str] = (), max_age: int = 600):
+        self.app = app
+        self.allow_origins = frozenset(origin.encode("latin-1") for origin in allow_origins)
+        self.preflight_headers = [
+            (b"access-control-allow-methods", _ALLOW_METHODS),
+            (b"access-control-max-age", str(max_age).encode("latin-1")),
+            (b"access-control-allow-credentials", b"true"),
+            (b"vary", b"Origin"),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        origin = None
+        request_method = None
+        request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+
+        if origin is None:
+            return await self.app(scope, receive, send)
+
+        if scope["method"] == "OPTIONS" and request_method is not None:
+            return await self.preflight_response(origin, request_headers, send)
+
+        if origin not in self.allow_origins:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = [
+                    (name, value) for name, value in message.get("headers", ())
+                    if name not in (b"access-control-allow-origin", b"access-control-allow-credentials")
+                ]
+                headers.append((b"access-control-allow-origin", origin))
+                headers.append((b"access-control-allow-credentials", b"true"))
+                for idx, (name, value) in enumerate(headers):
+                    if name == b"vary":
+                        headers[idx] = (name, value + b", Origin")
+                        break
+                else:
+                    headers.append((b"vary", b"Origin"))
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def preflight_response(self, origin: bytes, request_headers, send):
+        headers = list(self.preflight_headers)
+        if origin in self.allow_origins:
+            status, body = 200, b"OK"
+            headers.append((b"access-control-allow-origin", origin))
+            if request_headers:
+                headers.append((b"access-control-allow-headers", request_headers))
+        else:
+            status, body = 400, b"Disallowed CORS origin"
+        headers.append((b"content-type", _TEXT_PLAIN))
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -2,19 +2,33 @@ import time
 import asyncio
 import psutil
 import logging
-from starlette.middleware.base import BaseHTTPMiddleware
 
 logger = logging.getLogger("profiling")
 
+_process = psutil.Process()
 
-class ProfilingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        start_time = time.time()
-        response = await call_next(request)
-        duration = time.time() - start_time
-        process = psutil.Process()
-        mem_info = process.memory_info()
-        tasks = len(asyncio.all_tasks())
-        logger.info(
-            f"\033[33mRequest: {request.url.path}, Duration: {duration:.3f}s, Memory Usage: {mem_info.rss/1024/1024:.2f} MB, Background tasks: {tasks}\033[0m")
-        return response
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware that logs duration, memory usage and task count per request.
+    Avoids BaseHTTPMiddleware's Request/Response wrapping and extra task per call.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if logger.isEnabledFor(logging.INFO):
+                duration = time.perf_counter() - start_time
+                mem_info = _process.memory_info()
+                tasks = len(asyncio.all_tasks())
+                logger.info(
+                    "\033[33mRequest: %s, Duration: %.3fs, Memory Usage: %.2f MB, Background tasks: %d\033[0m",
+                    scope["path"], duration, mem_info.rss / 1024 / 1024, tasks)
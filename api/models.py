@@ -1,5 +1,6 @@
 from enum import Enum
 from typing import Optional
+from .utils.types import ModelSettings
 
 
 class ModelProvider(str, Enum):
@@ -12,6 +13,17 @@ class ModelProvider(str, Enum):
     # GOOGLE = "google"
 
 
+# ModelSettings fields forwarded to ModelConfig by from_request
+_MODEL_SETTING_KEYS = frozenset({
+    "temperature",
+    "max_tokens",
+    "top_p",
+    "top_k",
+    "frequency_penalty",
+    "presence_penalty",
+})
+
+
 class ModelConfig:
     """
     A class representing configuration details for different LLM providers.
@@ -42,6 +54,23 @@ class ModelConfig:
         self.presence_penalty = presence_penalty
         self.api_key = api_key
 
+    @classmethod
+    def from_request(
+        cls,
+        provider: ModelProvider,
+        model_settings: ModelSettings,
+        api_key: Optional[str] = None,
+    ) -> "ModelConfig":
+        """
+        Builds a config from already-validated request settings.
+        """
+        return cls(
+            provider=provider,
+            model_name=model_settings.model_choice,
+            api_key=api_key,
+            **model_settings.model_dump(include=_MODEL_SETTING_KEYS),
+        )
+
     def __repr__(self):
         return (
             f"ModelConfig(provider={self.provider}, "
@@ -1,4 +1,6 @@
 from enum import Enum, auto
+from types import MappingProxyType
+import orjson
 from typing import (
     Callable,
     List,
@@ -11,7 +13,7 @@ from typing import (
 )
 from ..models import ModelConfig, ModelProvider
 from .base import base_agent
-from .browser_use import browser_use_agent
+from .browser_use import browser_use_agent, browser_use_agent_batch
 from ..utils.types import AgentSettings
 
 # from .example_plugin import example_agent
@@ -42,7 +44,7 @@ class SettingConfig(TypedDict):
 
 
 # Agent configurations
-AGENT_CONFIGS = {
+_AGENT_CONFIGS_RAW = {
     # WebAgentType.BASE.value: {
     #     "name": "Base Agent",
     #     "description": "A simple agent with basic functionality",
@@ -157,20 +159,29 @@ AGENT_CONFIGS = {
     },
 }
 
+# Read-only view so accidental runtime mutation fails loudly
+AGENT_CONFIGS = MappingProxyType(_AGENT_CONFIGS_RAW)
+
+# Serialized once at import time; served as-is by /api/agents
+AGENT_CONFIGS_JSON: bytes = orjson.dumps(_AGENT_CONFIGS_RAW)
+
+
+_AGENT_DISPATCH: dict[WebAgentType, Callable] = {
+    WebAgentType.BASE: base_agent,
+    WebAgentType.BROWSER_USE: browser_use_agent,
+    WebAgentType.BROWSER_USE_BATCH: browser_use_agent_batch,
+}
+
 
 def get_web_agent(
     name: WebAgentType,
 ) -> Callable[
     [ModelConfig, AgentSettings, List[Mapping[str, Any]], str], Union[AsyncIterator[str], str]
 ]:
-    if name == WebAgentType.BASE:
-        return base_agent
-    elif name == WebAgentType.BROWSER_USE:
-        return browser_use_agent
-    elif name == WebAgentType.BROWSER_USE_BATCH:
-        return browser_use_agent_batch
-    else:
-        raise ValueError(f"Invalid agent type: {name}")
+    try:
+        return _AGENT_DISPATCH[name]
+    except KeyError:
+        raise ValueError(f"Invalid agent type: {name}") from None
 
 
-__all__ = ["WebAgentType", "get_web_agent", "AGENT_CONFIGS"]
+__all__ = ["WebAgentType", "get_web_agent", "AGENT_CONFIGS", "AGENT_CONFIGS_JSON"]
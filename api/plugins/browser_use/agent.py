@@ -1,6 +1,6 @@
 import logging
 from browser_use import Agent, Browser, BrowserConfig, Controller
-from typing import Any, List, Mapping, AsyncIterator, Optional, Dict
+from typing import Any, Callable, List, Mapping, AsyncIterator, Iterator, Optional, Dict
 from ...providers import create_llm
 from ...models import ModelConfig
 from langchain.schema import AIMessage
@@ -16,9 +16,22 @@ from browser_use.agent.views import (
 )
 import asyncio
 from pydantic import BaseModel
-import uuid
+import base64
+import hashlib
+import heapq
+import itertools
+import operator
+import shutil
+import tempfile
+import weakref
 from .system_prompt import ExtendedSystemPrompt
-from collections import defaultdict
+from functools import lru_cache
+from collections import deque
+from contextvars import ContextVar
+from cachetools import TTLCache
+from urllib.parse import quote_plus
+from dataclasses import dataclass, field
+from markupsafe import escape
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,61 +42,329 @@ os.environ["ANONYMIZED_TELEMETRY"] = "false"
 
 STEEL_API_KEY = os.getenv("STEEL_API_KEY")
 STEEL_CONNECT_URL = os.getenv("STEEL_CONNECT_URL")
+# CDP URL up to the session id; the key is URL-encoded once here
+_CDP_BASE = f"{STEEL_CONNECT_URL}?apiKey={quote_plus(STEEL_API_KEY or '')}&sessionId="
 
-# Dictionary to store active browser instances by session_id
-active_browsers: Dict[str, Browser] = {}
-active_browser_contexts: Dict[str, BrowserContext] = {}
+class BrowserSessionPool:
+    """Active browser instances and contexts, keyed by session_id."""
+
+    def __init__(self):
+        self._browsers: Dict[str, Browser] = {}
+        self._contexts: Dict[str, BrowserContext] = {}
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._browsers
+
+    def add(self, session_id: str, browser: Browser, browser_context: BrowserContext):
+        self._browsers[session_id] = browser
+        self._contexts[session_id] = browser_context
+
+    def get(self, session_id: str) -> tuple[Optional[Browser], Optional[BrowserContext]]:
+        return self._browsers.get(session_id), self._contexts.get(session_id)
+
+    def remove(self, session_id: str):
+        if self._browsers.pop(session_id, None) is not None:
+            logger.debug("✅ Removed session %s from active browsers", session_id)
+        if self._contexts.pop(session_id, None) is not None:
+            logger.debug("✅ Removed session %s from active browser contexts", session_id)
+
+    def restore_on_agent(self, agent: Agent, session_id: str):
+        """Points the agent back at the session's browser and context if they were swapped out."""
+        browser, browser_context = self.get(session_id)
+        if browser is not None and agent.browser is not browser:
+            logger.info("🔄 Restoring browser instance for session: %s", session_id)
+            agent.browser = browser
+        if browser_context is not None and agent.browser_context is not browser_context:
+            logger.info("🔄 Restoring browser context for session: %s", session_id)
+            agent.browser_context = browser_context
+
+
+# Active browser instances by session_id
+browser_sessions = BrowserSessionPool()
+
+class SessionState:
+    """Controller state for one agent run: the agent, its done/resume flags and message queue."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.agent: Optional[Agent] = None
+        self.finished = False  # Track if agent has finished executing its task
+        self.resume_event = asyncio.Event()  # Set by resume_execution, cleared on pause
+        self.queue: Optional[asyncio.Queue] = None
+        self.cached_page = None
+        self.tool_call_seq = itertools.count()  # Per-session tool call ids
+
+    @property
+    def resumed(self) -> bool:
+        return self.resume_event.is_set()
+
+    def set_resumed(self, resumed: bool) -> None:
+        if resumed:
+            self.resume_event.set()
+        else:
+            self.resume_event.clear()
+
+
+# The session whose agent is running in the current task. Agent tasks inherit it, so
+# actions dispatched by the shared controller see their own session's state.
+_current_session: ContextVar[Optional[SessionState]] = ContextVar("current_session", default=None)
+
+@dataclass(slots=True)
+class PageMetrics:
+    """Metrics collected for one page URL; None until captured."""
+    performance: Optional[Dict[str, Any]] = None
+    network: Optional[Dict[str, Any]] = None
+    anomalies: Optional[Dict[str, Any]] = None
+    screenshot: Optional[Dict[str, Any]] = None  # {"path", "size"} of the PNG on disk
+    full_report: Optional[str] = None
+
+    def metric_count(self) -> int:
+        values = _page_metric_values(self)
+        return len(values) - values.count(None)
+
+
+_page_metric_values = operator.attrgetter(*PageMetrics.__slots__)
+
+
+@dataclass(slots=True)
+class SessionMetrics:
+    """Per-page metrics for a session, plus cached formatter output keyed by (url, metric, args)."""
+    pages: Dict[str, PageMetrics] = field(default_factory=dict)
+    formatted: Dict[tuple, tuple] = field(default_factory=dict)
+    reports: Dict[str, tuple] = field(default_factory=dict)  # Rendered reports as (version, text)
+    version: int = 0  # Bumped on every stored change, invalidating `reports`
+    latest_report_url: Optional[str] = None  # Page whose full_report was stored last
+    richest_page_url: Optional[str] = None  # Page with the most metrics stored
+    richest_page_count: int = 0
+
+    def latest_report(self) -> tuple:
+        """Returns (url, full_report) for the most recently stored report, or (None, None)."""
+        url = self.latest_report_url
+        if url is None:
+            return None, None
+        return url, self.pages[url].full_report
+
+
+@dataclass(slots=True)
+class StepCollected:
+    """What browser_use_agent_batch gathers from the agent's step callbacks."""
+    memory: Any = None
+    final_report: Optional[str] = None
+    goals: List[Dict[str, Any]] = field(default_factory=list)
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    anomalies: Dict[str, Any] = field(default_factory=dict)
+    screenshots: Dict[str, Any] = field(default_factory=dict)
 
-# Global variable to track resume state
-_agent_resumed = False
 
 # Session storage for metrics
-session_metrics_storage: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(lambda: {"pages": {}})
+session_metrics_storage: Dict[str, SessionMetrics] = {}
+
+# Screenshots are written here and only referenced (path + size) from session metrics
+SCREENSHOT_DIR = os.path.join(tempfile.gettempdir(), "bugzer_sessions")
+
+
+def _session_screenshot_dir(session_id: str) -> str:
+    """Per-session screenshot directory; the ID is hashed so it is always a safe path component."""
+    return os.path.join(SCREENSHOT_DIR, hashlib.blake2b(session_id.encode(), digest_size=8).hexdigest())
+
+
+def _write_screenshot(path: str, screenshot_b64: str) -> int:
+    """Decodes a base64 screenshot to a PNG file and returns its size in bytes."""
+    png = base64.b64decode(screenshot_b64)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(png)
+    return len(png)
+
+
+async def _clear_session_screenshots(session_id: str):
+    """Deletes all screenshots saved for a session."""
+    await asyncio.to_thread(shutil.rmtree, _session_screenshot_dir(session_id), True)
+
 
 # Initialize the controller
 class SessionAwareController(Controller):
-    _instance = None
-    
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance.__init__(*args, **kwargs)
-        return cls._instance
-        
-    def __init__(self, *args, **kwargs):
-        if not hasattr(self, 'session_id'):  # Only initialize if not already initialized
-            super().__init__(*args, **kwargs)
-            self.session_id = None
-            self.agent = None
-            self.finished = False  # Track if agent has finished executing its task
+    """Action registry shared by all agents. Use the module-level `controller` instance.
+    Per-run state lives in SessionState, selected through the current task's context."""
 
-    def set_session_id(self, session_id: str):
-        self.session_id = session_id
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sessions: Dict[str, SessionState] = {}
+        # Sessions whose agent finished, kept after their state is dropped so a follow-up
+        # chat on the same Steel session is still refused; cleared on release or a new run
+        self.finished_sessions: TTLCache = TTLCache(maxsize=10_000, ttl=86_400)
+        self._hooked_pages = weakref.WeakSet()
+
+    def session_state(self, session_id: str) -> SessionState:
+        """Returns the state for session_id, creating it on first use."""
+        state = self.sessions.get(session_id)
+        if state is None:
+            state = self.sessions[session_id] = SessionState(session_id)
+        return state
+
+    def drop_session(self, session_id: str, state: Optional[SessionState] = None) -> bool:
+        """Forgets a session's state, freeing its agent, queue and page. With `state`, only
+        drops it if that is still the registered state, so a newer run keeps its own.
+        A finished session is remembered in finished_sessions. Returns whether a state was dropped."""
+        if state is not None and self.sessions.get(session_id) is not state:
+            return False
+        dropped = self.sessions.pop(session_id, None)
+        if dropped is None:
+            return False
+        if dropped.finished:
+            self.finished_sessions[session_id] = True
+        return True
+
+    def session_finished(self, session_id: str) -> bool:
+        """Whether the session's agent completed its task, even if its state was dropped since."""
+        state = self.sessions.get(session_id)
+        if state is not None:
+            return state.finished
+        return session_id in self.finished_sessions
+
+    @property
+    def current_session(self) -> Optional[SessionState]:
+        return _current_session.get()
+
+    @property
+    def session_id(self) -> Optional[str]:
+        state = _current_session.get()
+        return state.session_id if state else None
+
+    @property
+    def agent(self) -> Optional[Agent]:
+        state = _current_session.get()
+        return state.agent if state else None
+
+    @property
+    def queue(self) -> Optional[asyncio.Queue]:
+        state = _current_session.get()
+        return state.queue if state else None
+
+    @property
+    def finished(self) -> bool:
+        state = _current_session.get()
+        return state.finished if state else False
+
+    @finished.setter
+    def finished(self, value: bool):
+        state = _current_session.get()
+        if state:
+            state.finished = value
+
+    async def act(self, *args, **kwargs):
+        # Look the page up again for each action; helpers called within it share the handle
+        state = _current_session.get()
+        if state:
+            state.cached_page = None
+        return await super().act(*args, **kwargs)
+
+    async def current_page(self):
+        """Returns the agent's current page, cached until it navigates, closes or opens a popup."""
+        state = _current_session.get()
+        if state.cached_page is None:
+            page = await state.agent.browser_context.get_current_page()
+            if page not in self._hooked_pages:
+                # Pages outlive a run's SessionState (the browser is reused), so the
+                # handlers look up whichever state owns the session when they fire
+                self._hooked_pages.add(page)
+                session_id = state.session_id
+                page.on("framenavigated", lambda frame: frame.parent_frame is None and self._invalidate_page(session_id))
+                page.on("close", lambda _: self._invalidate_page(session_id))
+                page.on("popup", lambda _: self._invalidate_page(session_id))
+            state.cached_page = page
+        return state.cached_page
+
+    def _invalidate_page(self, session_id: str):
+        state = self.sessions.get(session_id)
+        if state is not None:
+            state.cached_page = None
+
+    def set_session_id(self, session_id: str) -> SessionState:
+        """Binds session_id to the current task; agent tasks started afterwards inherit it."""
+        state = self.session_state(session_id)
+        state.cached_page = None
+        _current_session.set(state)
         # Ensure session entry exists when ID is set
-        session_metrics_storage[session_id] # Access to initialize via defaultdict
+        if session_id not in session_metrics_storage:
+            session_metrics_storage[session_id] = SessionMetrics()
         # Reset finished state on new session
-        self.finished = False
-        logger.info(f"🔄 Controller finished state reset for session: {session_id}")
+        state.finished = False
+        self.finished_sessions.pop(session_id, None)
+        logger.info("🔄 Controller finished state reset for session: %s", session_id)
+        return state
 
     def set_agent(self, agent: Agent):
-        self.agent = agent
+        state = _current_session.get()
+        state.agent = agent
+        state.cached_page = None
 
-    def _get_current_session_metrics(self) -> Dict[str, Dict[str, Any]]:
-        """Helper to get the metrics dictionary for the current session."""
+    def _get_current_session_metrics(self) -> SessionMetrics:
+        """Helper to get the metrics for the current session."""
         if not self.session_id:
-            return {"pages": {}} # Should not happen if set_session_id is called
-        return session_metrics_storage[self.session_id]
-
-    def _store_metric(self, page_url: str, metric_type: str, data: Any):
-        """Helper to store a specific metric for a page in the session."""
+            return SessionMetrics() # Should not happen if set_session_id is called
+        # Reads must not insert entries for unknown sessions
+        return session_metrics_storage.get(self.session_id) or SessionMetrics()
+
+    def _find_latest_full_report(self) -> tuple:
+        """Returns (url, full_report) for the current session's most recent report, or (None, None)."""
+        session_data = session_metrics_storage.get(self.session_id) if self.session_id else None
+        if session_data is None:
+            return None, None
+        return session_data.latest_report()
+
+    def _store_metric(self, page_url: str, metric_type: str, data: Any) -> Any:
+        """Helper to store a specific metric for a page in the session.
+        Returns the stored object, which is the previous one if the data is unchanged."""
         if not self.session_id:
             logger.warning("Attempted to store metric without session_id")
-            return
+            return data
+        session_data = session_metrics_storage.get(self.session_id)
+        if session_data is None:
+            session_data = session_metrics_storage[self.session_id] = SessionMetrics()
+        page_metrics = session_data.pages.get(page_url)
+        if page_metrics is None:
+            page_metrics = session_data.pages[page_url] = PageMetrics()
+        previous = getattr(page_metrics, metric_type)
+        if previous is not None and previous == data:
+            # Keep the existing object so cached renderings of it stay valid
+            return previous
+        setattr(page_metrics, metric_type, data)
+        session_data.version += 1
+        # Keep the lookup indexes for the report actions current
+        if previous is None:
+            count = page_metrics.metric_count()
+            if count > session_data.richest_page_count:
+                session_data.richest_page_url = page_url
+                session_data.richest_page_count = count
+        if metric_type == "full_report":
+            session_data.latest_report_url = page_url
+        logger.debug("Stored %s for %s in session %s", metric_type, page_url, self.session_id)
+        return data
+
+    def _get_formatted(self, page_url: str, metric_type: str, data: Any, formatter: Callable[..., str], *args) -> str:
+        """Returns formatter(page_url, data, *args), reusing the last rendering while the stored data is unchanged."""
+        if not self.session_id:
+            return formatter(page_url, data, *args)
+        cache = self._get_current_session_metrics().formatted
+        key = (page_url, metric_type, args)
+        cached = cache.get(key)
+        if cached is not None and cached[0] is data:
+            return cached[1]
+        text = formatter(page_url, data, *args)
+        cache[key] = (data, text)
+        return text
+
+    def _cached_report(self, name: str, build: Callable[[], str]) -> str:
+        """Returns build(), reusing the previous result while nothing was stored for the session since."""
         session_data = self._get_current_session_metrics()
-        if page_url not in session_data["pages"]:
-            session_data["pages"][page_url] = {}
-        session_data["pages"][page_url][metric_type] = data
-        logger.debug(f"Stored {metric_type} for {page_url} in session {self.session_id}")
+        cached = session_data.reports.get(name)
+        if cached is not None and cached[0] == session_data.version:
+            return cached[1]
+        text = build()
+        # Read the version after building, which may itself store a fallback report
+        session_data.reports[name] = (session_data.version, text)
+        return text
 
 controller = SessionAwareController(exclude_actions=["open_tab", "switch_tab"])
 
@@ -93,67 +374,606 @@ def print_call(message: str) -> str:
     print(f"🔔 Tool call: {message}")
     return f"Printed: {message}"
 
-@controller.action('Capture page performance metrics')
-async def capture_performance_metrics() -> str:
-    """Captures page performance metrics including latency, load time, and other timing information. Stores data for session summary."""
-    if not controller.agent or not controller.agent.browser_context:
-        return "No active browser context found"
+# Page-side metric collectors. Each one is a JS function of the page's resource
+# timing entries so they can be evaluated on their own or combined into a single
+# page.evaluate() round-trip that reads the entry list only once.
+_PERFORMANCE_JS = """(resources) => {
+    const perfData = window.performance.timing;
+    const navStart = perfData.navigationStart;
     
-    page = None # Initialize page to None
-    try:
-        # Get the current page
-        page = await controller.agent.browser_context.get_current_page()
-        page_url = page.url # Capture URL early
+    // Single pass over the resource entries for totals and the 5 slowest
+    let totalSize = 0;
+    let totalDuration = 0;
+    const slowest = [];  // sorted by duration, descending
+    for (const resource of resources) {
+        totalSize += resource.transferSize || 0;
+        totalDuration += resource.duration;
+        if (slowest.length === 5) {
+            if (resource.duration <= slowest[4].duration) continue;
+            slowest.pop();
+        }
+        let i = slowest.length;
+        while (i > 0 && slowest[i - 1].duration < resource.duration) i--;
+        slowest.splice(i, 0, resource);
+    }
+    
+    // Create an object with all the relevant timing metrics
+    const metrics = {
+        // Page load metrics
+        pageLoadTime: perfData.loadEventEnd - navStart,
+        domContentLoaded: perfData.domContentLoadedEventEnd - navStart,
+        firstPaint: performance.getEntriesByName('first-paint')[0]?.startTime || 0,
+        firstContentfulPaint: performance.getEntriesByName('first-contentful-paint')[0]?.startTime || 0,
+        
+        // Connection metrics
+        dnsLookupTime: perfData.domainLookupEnd - perfData.domainLookupStart,
+        tcpConnectionTime: perfData.connectEnd - perfData.connectStart,
+        serverResponseTime: perfData.responseEnd - perfData.responseStart,
+        
+        // Processing metrics
+        domProcessingTime: perfData.domComplete - perfData.domLoading,
+        resourceLoadTime: perfData.loadEventEnd - perfData.responseEnd,
+        
+        // Resource metrics
+        resourceStats: {
+            totalResources: resources.length,
+            totalSize: totalSize,
+            totalDuration: totalDuration
+        }
+    };
+    
+    // Add resource data
+    metrics.slowestResources = slowest.map(resource => ({
+        url: resource.name,
+        duration: resource.duration,
+        size: resource.transferSize || 0,
+        type: resource.initiatorType
+    }));
+        
+    return metrics;
+}"""
+
+_NETWORK_JS = """(resources) => {
+    // Organize by type, keeping per-type totals so the report doesn't re-sum every request
+    const resourcesByType = {};
+    const byTypeTotals = {};
+    resources.forEach(resource => {
+        const type = resource.initiatorType || 'other';
+        if (!resourcesByType[type]) {
+            resourcesByType[type] = [];
+            byTypeTotals[type] = { count: 0, totalSize: 0 };
+        }
+        const size = resource.transferSize || 0;
+        resourcesByType[type].push({
+            url: resource.name,
+            duration: resource.duration,
+            size: size,
+            startTime: resource.startTime
+        });
+        byTypeTotals[type].count++;
+        byTypeTotals[type].totalSize += size;
+    });
+    
+    // Get failed resources from our monitoring namespace
+    const possibleErrors = window.__BROWSER_USE_MONITOR ? window.__BROWSER_USE_MONITOR.networkErrors : [];
+    
+    return {
+        totalRequests: resources.length,
+        byType: resourcesByType,
+        byTypeTotals: byTypeTotals,
+        possibleErrors: possibleErrors
+    };
+}"""
+
+_ANOMALIES_JS = """async (resources) => {
+    const anomalies = {
+        consoleErrors: window.__BROWSER_USE_MONITOR ? window.__BROWSER_USE_MONITOR.consoleErrors : [],
+        layoutIssues: [],
+        networkIssues: [],
+        performanceIssues: [],
+        accessibilityIssues: []
+    };
+    
+    async function collectDomIssues() {
+        // Query only the elements we inspect, then split them by tag in one pass
+        const interactive = [];
+        const images = [];
+        const formControls = [];
+        for (const el of document.querySelectorAll('button, a, input, select, textarea, img')) {
+            switch (el.tagName) {
+                case 'IMG':
+                    images.push(el);
+                    break;
+                case 'TEXTAREA':
+                    formControls.push(el);
+                    break;
+                case 'INPUT':
+                case 'SELECT':
+                    formControls.push(el);
+                    interactive.push(el);
+                    break;
+                default:
+                    interactive.push(el);
+            }
+        }
+    
+        // Check for layout issues (elements offscreen or overlapping)
+        const checkOffscreen = (el, rect) => {
+            if (rect.width > 0 && rect.height > 0) {
+                if (rect.right < 0 || rect.bottom < 0 || rect.left > viewportWidth || rect.top > viewportHeight) {
+                    const text = el.textContent || el.value || el.id || el.className || el.tagName;
+                    anomalies.layoutIssues.push(`Interactive element offscreen: ${text.trim().substring(0, 50)}`);
+                }
+            }
+        };
+    
+        // Check for offscreen elements that might be important. An IntersectionObserver
+        // reports every element's rect from a single layout pass instead of forcing a
+        // synchronous layout per getBoundingClientRect() call.
+        if (interactive.length > 0 && typeof IntersectionObserver === 'function') {
+            const rects = new Map();
+            await new Promise(resolve => {
+                let timer;
+                const finish = () => {
+                    clearTimeout(timer);
+                    io.disconnect();
+                    resolve();
+                };
+                const io = new IntersectionObserver(entries => {
+                    entries.forEach(entry => rects.set(entry.target, entry.boundingClientRect));
+                    if (rects.size >= interactive.length) finish();
+                });
+                interactive.forEach(el => io.observe(el));
+                // Observations are delivered with the next rendering update; don't hang if none comes
+                timer = setTimeout(finish, 1000);
+            });
+            interactive.forEach(el => {
+                const rect = rects.get(el);
+                if (rect) checkOffscreen(el, rect);
+            });
+        } else {
+            interactive.forEach(el => checkOffscreen(el, el.getBoundingClientRect()));
+        }
+    
+        // Basic accessibility check
+        images.forEach(el => {
+            if (!el.alt || el.alt === '') {
+                anomalies.accessibilityIssues.push(`Image missing alt text: ${el.src}`);
+            }
+        });
+    
+        formControls.forEach(input => {
+            const label = document.querySelector(`label[for="${input.id}"]`);
+            if (!label && !input.getAttribute('aria-label')) {
+                const desc = input.id || input.name || input.placeholder || input.tagName;
+                anomalies.accessibilityIssues.push(`Form control missing label: ${desc}`);
+            }
+        });
+    }
+    
+    // The layout and accessibility checks walk the DOM. Reuse their last result while
+    // a MutationObserver confirms the document, scroll position and viewport are unchanged.
+    const viewportWidth = window.innerWidth;
+    const viewportHeight = window.innerHeight;
+    const domKey = `${location.href}|${window.scrollX},${window.scrollY}|${viewportWidth}x${viewportHeight}`;
+    const domCache = window.__BROWSER_USE_DOM_ANOMALIES;
+    if (domCache && !domCache.dirty && domCache.key === domKey) {
+        anomalies.layoutIssues = domCache.layoutIssues.slice();
+        anomalies.accessibilityIssues = domCache.accessibilityIssues.slice();
+    } else {
+        const cache = domCache || {};
+        if (!cache.observer && typeof MutationObserver === 'function') {
+            cache.observer = new MutationObserver(() => { cache.dirty = true; });
+            cache.observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+        }
+        // Mark clean before walking the DOM so mutations made meanwhile invalidate the result
+        cache.dirty = !cache.observer;
+        await collectDomIssues();
+        cache.key = domKey;
+        cache.layoutIssues = anomalies.layoutIssues.slice();
+        cache.accessibilityIssues = anomalies.accessibilityIssues.slice();
+        window.__BROWSER_USE_DOM_ANOMALIES = cache;
+    }
+    
+    // Check for network timing anomalies
+    resources.forEach(resource => {
+        if (resource.duration > 2000) {
+            anomalies.networkIssues.push(`Slow resource (${resource.duration.toFixed(0)}ms): ${resource.name}`);
+        }
+    });
+    
+    // Check for performance issues
+    const timing = performance.timing;
+    if (timing.loadEventEnd - timing.navigationStart > 5000) {
+        anomalies.performanceIssues.push(`Page load time exceeds 5 seconds (${(timing.loadEventEnd - timing.navigationStart)}ms)`);
+    }
+    
+    if (timing.domInteractive - timing.navigationStart > 3000) {
+        anomalies.performanceIssues.push(`Time to interactive exceeds 3 seconds (${(timing.domInteractive - timing.navigationStart)}ms)`);
+    }
+    
+    return anomalies;
+}"""
+
+_METRIC_COLLECTORS = {
+    "performance": _PERFORMANCE_JS,
+    "network": _NETWORK_JS,
+    "anomalies": _ANOMALIES_JS,
+}
+_ALL_METRIC_KINDS = tuple(_METRIC_COLLECTORS)
+
+# Installs the collectors as window.__bugzer_collectors so each capture only sends a short
+# call across CDP. Registered as a context init script; _collect_metrics installs it on
+# pages that were already open before that.
+_COLLECTORS_INIT_JS = "window.__bugzer_collectors = {\n%s\n};" % ",\n".join(
+    f"{kind}: {source}" for kind, source in _METRIC_COLLECTORS.items()
+)
+_INSTALL_COLLECTORS_JS = f"() => {{\n{_COLLECTORS_INIT_JS}\n}}"
+
+# Full-page scroll so lazy-loaded content is rendered before the screenshot. The scroll
+# runs in the background; completion is signalled through window.__BROWSER_USE_SCROLL_DONE.
+_SCROLL_PAGE_JS = """() => {
+    window.__BROWSER_USE_SCROLL_DONE = false;
+    // Resolve after layout and paint (double rAF); the timeout covers throttled background tabs
+    const nextFrame = () => new Promise(r => {
+        requestAnimationFrame(() => requestAnimationFrame(r));
+        setTimeout(r, 100);
+    });
+    
+    // Give lazy images that started loading a brief chance to finish
+    const lazyImagesLoaded = () => Promise.all(
+        Array.from(document.querySelectorAll('img[loading="lazy"]'))
+            .filter(img => !img.complete)
+            .slice(0, 10)
+            .map(img => new Promise(r => {
+                img.addEventListener('load', r, { once: true });
+                img.addEventListener('error', r, { once: true });
+                setTimeout(r, 100);
+            }))
+    );
+    
+    // Function to scroll down the page in increments
+    const scrollPageAndCapture = async () => {
+        // Get the initial page dimensions
+        const fullHeight = Math.max(
+            document.body.scrollHeight,
+            document.documentElement.scrollHeight,
+            document.body.offsetHeight,
+            document.documentElement.offsetHeight,
+            document.body.clientHeight,
+            document.documentElement.clientHeight
+        );
+        
+        // Scroll down in increments
+        const scrollStep = window.innerHeight / 2; // Half a viewport
+        let currentScroll = 0;
+        
+        // First scroll to top to ensure we start from the beginning
+        window.scrollTo(0, 0);
+        await nextFrame();
+        
+        // Continue scrolling until we reach the bottom
+        while (currentScroll < fullHeight) {
+            window.scrollTo(0, currentScroll);
+            await nextFrame(); // Wait for content to render
+            await lazyImagesLoaded();
+            currentScroll += scrollStep;
+        }
         
-        # Use JavaScript to get detailed performance metrics
-        perf_metrics = await page.evaluate("""() => {
-            const perfData = window.performance.timing;
-            const navStart = perfData.navigationStart;
-            
-            // Create an object with all the relevant timing metrics
-            const metrics = {
-                // Page load metrics
-                pageLoadTime: perfData.loadEventEnd - navStart,
-                domContentLoaded: perfData.domContentLoadedEventEnd - navStart,
-                firstPaint: performance.getEntriesByType('paint').find(entry => entry.name === 'first-paint')?.startTime || 0,
-                firstContentfulPaint: performance.getEntriesByType('paint').find(entry => entry.name === 'first-contentful-paint')?.startTime || 0,
+        // Final scroll to the bottom to make sure we've seen everything
+        window.scrollTo(0, fullHeight);
+        await nextFrame();
+        
+        // Scroll back to top
+        window.scrollTo(0, 0);
+        await nextFrame();
+        
+        // Signal to the browser-use system that we've done the scrolling
+        return true;
+    };
+    
+    // Start the scroll without holding this evaluate call open
+    scrollPageAndCapture()
+        .catch(() => {})
+        .finally(() => { window.__BROWSER_USE_SCROLL_DONE = true; });
+}"""
+_SCROLL_DONE_JS = "() => window.__BROWSER_USE_SCROLL_DONE === true"
+
+# Listens for console errors for future anomaly captures
+_CONSOLE_MONITOR_JS = """() => {
+    // Initialize our monitoring namespace if not present
+    if (!window.__BROWSER_USE_MONITOR) {
+        window.__BROWSER_USE_MONITOR = {
+            networkRequests: [],
+            networkErrors: [],
+            consoleErrors: [],
+            initialized: false
+        };
+    }
+    
+    // Set up console error tracking if not already set up
+    if (!window.__BROWSER_USE_MONITOR.initialized) {
+        // Keep only the most recent errors so the buffer and its CDP payload stay bounded
+        const recordError = (message) => {
+            const errors = window.__BROWSER_USE_MONITOR.consoleErrors;
+            if (errors.length >= 100) errors.shift();
+            errors.push(message);
+        };
+        
+        window.addEventListener('error', (e) => {
+            recordError(`${e.message} at ${e.filename}:${e.lineno}`);
+        });
+        
+        // Override console.error to capture error messages
+        const originalConsoleError = console.error;
+        console.error = function() {
+            recordError(Array.from(arguments).join(' '));
+            originalConsoleError.apply(console, arguments);
+        };
+        
+        window.__BROWSER_USE_MONITOR.initialized = true;
+    }
+}"""
+
+
+# Tracks XHR/fetch requests and console errors in __BROWSER_USE_MONITOR; idempotent per document
+_MONITOR_JS = """() => {
+    // Create a namespace for the browser-use monitoring tools
+    // Only initialize if it doesn't exist yet
+    if (!window.__BROWSER_USE_MONITOR) {
+        window.__BROWSER_USE_MONITOR = {
+            networkRequests: [],
+            networkErrors: [],
+            consoleErrors: [],
+            // Running request counters, so stats queries never rescan networkRequests
+            stats: { total: 0, inProgress: 0, completed: 0, failed: 0 },
+            initialized: false
+        };
+        
+        console.log('[browser-use] Initializing performance monitoring');
+        
+        // Keep only the most recent entries so the buffers and their CDP payloads stay
+        // bounded; the stats counters still cover every request
+        const MAX_REQUESTS = 500;
+        const MAX_ERRORS = 100;
+        const record = (list, item, cap) => {
+            if (list.length >= cap) list.shift();
+            list.push(item);
+        };
+        
+        const stats = window.__BROWSER_USE_MONITOR.stats;
+        const track = (request) => {
+            record(window.__BROWSER_USE_MONITOR.networkRequests, request, MAX_REQUESTS);
+            stats.total++;
+            stats.inProgress++;
+        };
+        const settle = (request) => {
+            stats.inProgress--;
+            stats.completed++;
+            const status = request.status;
+            if (status === 'failed' || (typeof status === 'number' && (status < 200 || status >= 400))) {
+                stats.failed++;
+            }
+        };
+        
+        // Track XHR requests
+        const originalXhrOpen = XMLHttpRequest.prototype.open;
+        const originalXhrSend = XMLHttpRequest.prototype.send;
+        
+        XMLHttpRequest.prototype.open = function(method, url) {
+            this.__requestData = { method, url, type: 'xhr', startTime: performance.now(), status: 'pending' };
+            track(this.__requestData);
+            return originalXhrOpen.apply(this, arguments);
+        };
+        
+        XMLHttpRequest.prototype.send = function() {
+            if (this.__requestData) {
+                const request = this.__requestData;
                 
-                // Connection metrics
-                dnsLookupTime: perfData.domainLookupEnd - perfData.domainLookupStart,
-                tcpConnectionTime: perfData.connectEnd - perfData.connectStart,
-                serverResponseTime: perfData.responseEnd - perfData.responseStart,
+                this.addEventListener('load', function() {
+                    request.status = this.status;
+                    request.duration = performance.now() - request.startTime;
+                    request.size = parseInt(this.getResponseHeader('Content-Length') || '0');
+                    settle(request);
+                });
                 
-                // Processing metrics
-                domProcessingTime: perfData.domComplete - perfData.domLoading,
-                resourceLoadTime: perfData.loadEventEnd - perfData.responseEnd,
+                this.addEventListener('error', function() {
+                    request.status = 'failed';
+                    request.duration = performance.now() - request.startTime;
+                    settle(request);
+                    const errorMsg = `XHR failed: ${request.method} ${request.url}`;
+                    record(window.__BROWSER_USE_MONITOR.networkErrors, errorMsg, MAX_ERRORS);
+                });
                 
-                // Resource metrics
-                resourceStats: {
-                    totalResources: performance.getEntriesByType('resource').length,
-                    totalSize: performance.getEntriesByType('resource').reduce((total, resource) => total + (resource.transferSize || 0), 0),
-                    totalDuration: performance.getEntriesByType('resource').reduce((total, resource) => total + resource.duration, 0)
-                }
+                this.addEventListener('timeout', function() {
+                    request.status = 'timeout';
+                    request.duration = performance.now() - request.startTime;
+                    settle(request);
+                    const errorMsg = `XHR timeout: ${request.method} ${request.url}`;
+                    record(window.__BROWSER_USE_MONITOR.networkErrors, errorMsg, MAX_ERRORS);
+                });
+            }
+            return originalXhrSend.apply(this, arguments);
+        };
+        
+        // Track fetch requests
+        const originalFetch = window.fetch;
+        window.fetch = function(resource, init) {
+            const url = typeof resource === 'string' ? resource : resource.url;
+            const method = init?.method || (typeof resource === 'string' ? 'GET' : resource.method || 'GET');
+            
+            const requestData = { 
+                method, 
+                url, 
+                type: 'fetch', 
+                startTime: performance.now(), 
+                status: 'pending' 
             };
             
-            // Add resource data
-            metrics.slowestResources = performance.getEntriesByType('resource')
-                .sort((a, b) => b.duration - a.duration)
-                .slice(0, 5)
-                .map(resource => ({
-                    url: resource.name,
-                    duration: resource.duration,
-                    size: resource.transferSize || 0,
-                    type: resource.initiatorType
-                }));
-                
-            return metrics;
-        }""")
-        
-        # Store the raw data
-        controller._store_metric(page_url, "performance", perf_metrics)
+            track(requestData);
+            
+            return originalFetch.apply(this, arguments)
+                .then(response => {
+                    requestData.status = response.status;
+                    requestData.duration = performance.now() - requestData.startTime;
+                    settle(requestData);
+                    
+                    if (!response.ok) {
+                        const errorMsg = `Fetch error ${response.status}: ${method} ${url}`;
+                        record(window.__BROWSER_USE_MONITOR.networkErrors, errorMsg, MAX_ERRORS);
+                    }
+                    
+                    return response;
+                })
+                .catch(error => {
+                    requestData.status = 'failed';
+                    requestData.duration = performance.now() - requestData.startTime;
+                    settle(requestData);
+                    
+                    const errorMsg = `Fetch failed: ${method} ${url} - ${error.message}`;
+                    record(window.__BROWSER_USE_MONITOR.networkErrors, errorMsg, MAX_ERRORS);
+                    
+                    throw error;
+                });
+        };
+        
+        // Track console errors
+        window.addEventListener('error', (e) => {
+            record(window.__BROWSER_USE_MONITOR.consoleErrors, `${e.message} at ${e.filename}:${e.lineno}`, MAX_ERRORS);
+        });
+        
+        // Override console.error to capture error messages
+        const originalConsoleError = console.error;
+        console.error = function() {
+            record(window.__BROWSER_USE_MONITOR.consoleErrors, Array.from(arguments).join(' '), MAX_ERRORS);
+            originalConsoleError.apply(console, arguments);
+        };
+        
+        window.__BROWSER_USE_MONITOR.initialized = true;
+        console.log('[browser-use] Performance monitoring initialized');
+    } else {
+        console.log('[browser-use] Performance monitoring already initialized');
+    }
+}"""
+_MONITOR_INIT_JS = f"({_MONITOR_JS})();"
+
+@lru_cache(maxsize=None)
+def _collector_script(kinds: tuple) -> str:
+    """Builds one page.evaluate() script returning {kind: result} for the given collectors, or null if they aren't installed."""
+    fields = ",\n".join(f"{kind}: await collectors.{kind}(resources)" for kind in kinds)
+    return (
+        "async () => {\n"
+        "const collectors = window.__bugzer_collectors;\n"
+        "if (!collectors) return null;\n"
+        "const resources = performance.getEntriesByType('resource');\n"
+        f"return {{\n{fields}\n}};\n"
+        "}"
+    )
+
+
+async def _install_collectors(browser_context: BrowserContext):
+    """Registers the metric collectors on every page the context opens from now on."""
+    try:
+        session = await browser_context.get_session()
+        await session.context.add_init_script(_COLLECTORS_INIT_JS)
+    except Exception as e:
+        logger.warning("⚠️ Could not register metric collectors, falling back to per-page install: %s", e)
+
+
+async def _collect_metrics(page, page_url: str, kinds: tuple = _ALL_METRIC_KINDS) -> Dict[str, Any]:
+    """Runs the requested collectors in a single page.evaluate() and returns the stored results."""
+    script = _collector_script(kinds)
+    results = await page.evaluate(script)
+    if results is None:
+        await page.evaluate(_INSTALL_COLLECTORS_JS)
+        results = await page.evaluate(script)
+    if not results:
+        # The page blocked or wiped the collectors (CSP, or it navigated mid-call); callers
+        # turn this into their usual "Failed to capture ..." message
+        raise RuntimeError("metric collectors are unavailable on this page")
+    return {kind: controller._store_metric(page_url, kind, data) for kind, data in results.items()}
+
+
+async def _capture_full_page_screenshot(page, page_url: str) -> Optional[str]:
+    """Scrolls through the page and takes a screenshot. Returns None if it fails or times out."""
+    screenshot_b64 = None
+    try:
+        # Scroll the full page so lazy-loaded content is rendered
+        await page.evaluate(_SCROLL_PAGE_JS)
+        try:
+            await page.wait_for_function(_SCROLL_DONE_JS, timeout=10000)
+        except Exception as scroll_error:
+            logger.warning("⚠️ Page scroll did not finish for %s, taking screenshot anyway: %s", page_url, scroll_error)
+        
+        # Now capture the screenshot after scrolling
+        screenshot_task = asyncio.create_task(controller.agent.browser_context.take_screenshot())
+        screenshot_b64 = await asyncio.wait_for(screenshot_task, timeout=15.0)  # 15 second timeout
+        logger.info("📸 Full-page screenshot captured successfully for %s", page_url)
+    except asyncio.TimeoutError:
+        logger.warning("⚠️ Screenshot capture timed out for %s, continuing without screenshot", page_url)
+    except Exception as screenshot_error:
+        logger.warning("⚠️ Screenshot capture failed for %s: %s", page_url, screenshot_error)
+    
+    # Store screenshot only if successfully captured. Only a reference is kept in
+    # memory; the decoded PNG goes to disk off the event loop.
+    if screenshot_b64 and controller.session_id:
+        path = os.path.join(
+            _session_screenshot_dir(controller.session_id),
+            f"{hashlib.blake2b(page_url.encode(), digest_size=16).hexdigest()}.png",
+        )
+        try:
+            size = await asyncio.to_thread(_write_screenshot, path, screenshot_b64)
+            controller._store_metric(page_url, "screenshot", {"path": path, "size": size})
+        except Exception as write_error:
+            logger.warning("⚠️ Failed to save screenshot for %s: %s", page_url, write_error)
+    return screenshot_b64
+
+
+# Placeholder structures for the session summary, overwritten with whatever was collected.
+# Built fresh per call by plain literals, which is much cheaper than deep-copying a template.
+def _new_summary_perf_data() -> Dict[str, Any]:
+    return {
+        'pageLoadTime': 'N/A',
+        'domContentLoaded': 'N/A',
+        'firstPaint': 'N/A',
+        'firstContentfulPaint': 'N/A',
+        'dnsLookupTime': 'N/A',
+        'tcpConnectionTime': 'N/A',
+        'serverResponseTime': 'N/A',
+        'domProcessingTime': 'N/A',
+        'resourceLoadTime': 'N/A',
+        'resourceStats': {
+            'totalResources': 'N/A',
+            'totalSize': 0,
+            'totalDuration': 'N/A'
+        },
+        'slowestResources': []
+    }
+
+
+def _new_summary_network_data() -> Dict[str, Any]:
+    return {
+        'totalRequests': 'N/A',
+        'byType': {},
+        'byTypeTotals': {},
+        'largestRequests': []
+    }
+
+
+def _new_summary_anomalies_data() -> Dict[str, List[str]]:
+    return {
+        'consoleErrors': [],
+        'layoutIssues': [],
+        'networkIssues': [],
+        'performanceIssues': [],
+        'accessibilityIssues': []
+    }
+
 
-        # Format the results for better readability
-        formatted_result = f"""
+def _format_performance_metrics(page_url: str, perf_metrics: Dict[str, Any]) -> str:
+    """Formats raw performance metrics for display."""
+    resource_stats = perf_metrics['resourceStats']
+    parts = [f"""
         📊 Page Performance Metrics for {page_url}:
         
         ⏱️ Timing Metrics:
@@ -172,24 +992,155 @@ async def capture_performance_metrics() -> str:
         - Resource Loading: {perf_metrics['resourceLoadTime']}ms
         
         📦 Resource Stats:
-        - Total Resources: {perf_metrics['resourceStats']['totalResources']}
-        - Total Size: {perf_metrics['resourceStats']['totalSize'] / 1024:.2f} KB
-        - Total Resource Duration: {perf_metrics['resourceStats']['totalDuration']}ms
-        
-        🐢 Top 5 Slowest Resources:"""
+        - Total Resources: {resource_stats['totalResources']}
+        - Total Size: {resource_stats['totalSize'] / 1024:.2f} KB
+        - Total Resource Duration: {resource_stats['totalDuration']}ms
         
-        # Add slowest resources to the output
-        for idx, resource in enumerate(perf_metrics['slowestResources']):
-            formatted_result += f"""
-        {idx+1}. {resource['url']} 
+        🐢 Top 5 Slowest Resources:"""]
+    
+    # Add slowest resources to the output
+    parts.extend(f"""
+        {idx}. {resource['url']} 
            - Duration: {resource['duration']}ms
            - Size: {resource['size'] / 1024:.2f} KB
-           - Type: {resource['type']}"""
-            
-        return formatted_result
+           - Type: {resource['type']}""" for idx, resource in enumerate(perf_metrics['slowestResources'], 1))
+        
+    return "".join(parts)
+
+
+def _format_network_requests(page_url: str, network_data: Dict[str, Any]) -> str:
+    """Formats raw network request data for display."""
+    by_type = network_data['byType']
+    possible_errors = network_data['possibleErrors']
+    parts = [f"""
+        🌐 Network Request Summary for {page_url}:
+        
+        📊 Overview:
+        - Total Requests: {network_data['totalRequests']}
+        """]
+    
+    # Add resource types
+    parts.append("\n        📑 Requests by Type:")
+    for resource_type, totals in network_data['byTypeTotals'].items():
+        parts.append(f"\n        - {resource_type.capitalize()}: {totals['count']} requests ({totals['totalSize'] / 1024:.2f} KB)")
+    
+    # Add most significant requests
+    parts.append("\n\n        📋 Largest Requests:")
+    largest_requests = heapq.nlargest(
+        5,
+        itertools.chain.from_iterable(by_type.values()),
+        key=lambda r: r['size']
+    )
+    
+    parts.extend(f"""
+        {idx}. {request['url']} 
+           - Size: {request['size'] / 1024:.2f} KB
+           - Duration: {request['duration']}ms""" for idx, request in enumerate(largest_requests, 1))
+    
+    # Check for potential network errors
+    if possible_errors:
+        parts.append("\n\n        ⚠️ Possible Network Errors:")
+        parts.extend(f"\n        {idx}. {error}" for idx, error in enumerate(possible_errors, 1))
+    
+    return "".join(parts)
+
+
+# Banner get_session_summary puts around the report it returns
+_SUMMARY_REPORT_HEADER = "\n============ PERFORMANCE METRICS REPORT ============\n\n"
+_SUMMARY_REPORT_FOOTER = "\n\n=================================================="
+
+# Placeholder sections for get_session_summary's error report; only the URL and error vary
+_ERROR_REPORT_BODY = """⏱️ Timing Metrics:
+- Page Load Time: N/A (Error occurred)
+- DOM Content Loaded: N/A
+- First Paint: N/A
+- First Contentful Paint: N/A
+
+🔄 Connection Metrics:
+- DNS Lookup: N/A
+- TCP Connection: N/A
+- Server Response: N/A
+
+⚙️ Processing Metrics:
+- DOM Processing: N/A
+- Resource Loading: N/A
+
+📦 Resource Stats:
+- Total Resources: N/A
+- Total Size: 0.00 KB
+- Total Resource Duration: N/A
+
+🐢 Top 5 Slowest Resources:
+- No resource data available
+
+🌐 Network Request Summary:
+📊 Overview:
+- Total Requests: N/A
+
+📑 Requests by Type:
+- No request type data available
+
+📋 Largest Requests:
+- No largest request data available
+
+🔍 Top Anomalies:
+⚠️ Error generating report: """
+
+# Anomaly categories in report order, with their section headers
+_ANOMALY_SECTIONS = (
+    ('consoleErrors', '🛑 Console Errors:'),
+    ('layoutIssues', '📐 Layout Issues:'),
+    ('networkIssues', '🌐 Network Issues:'),
+    ('performanceIssues', '⏱️ Performance Issues:'),
+    ('accessibilityIssues', '♿ Accessibility Issues:'),
+)
+
+
+def _format_page_anomalies(page_url: str, anomalies: Dict[str, Any], screenshot_captured: bool) -> str:
+    """Formats raw anomaly data for display."""
+    parts = [f"""
+        🔍 Anomaly Detection for {page_url}:
+        """]
+    
+    # Add screenshot status
+    if screenshot_captured:
+        parts.append("\n        📸 Screenshot captured for visual inspection (saved as a PNG on disk; the page metrics keep its path)")
+    else:
+        parts.append("\n        ⚠️ Screenshot capture was skipped or failed")
+    
+    # A clean page is the common case; any() stops at the first non-empty section
+    if not any(anomalies.values()):
+        parts.append("\n        ✅ No anomalies detected! Page appears to be functioning normally.")
+    else:
+        total_anomalies = sum(len(issues) for issues in anomalies.values())
+        parts.append(f"\n        ⚠️ {total_anomalies} potential issues detected:")
+        
+        for key, header in _ANOMALY_SECTIONS:
+            issues = anomalies[key]
+            if issues:
+                parts.append(f"\n\n        {header}")
+                parts.extend(f"\n        {idx}. {issue}" for idx, issue in enumerate(issues, 1))
+                
+    return "".join(parts)
+
+
+@controller.action('Capture page performance metrics')
+async def capture_performance_metrics() -> str:
+    """Captures page performance metrics including latency, load time, and other timing information. Stores data for session summary."""
+    if not controller.agent or not controller.agent.browser_context:
+        return "No active browser context found"
+    
+    page = None # Initialize page to None
+    try:
+        # Get the current page
+        page = await controller.current_page()
+        page_url = page.url # Capture URL early
+        
+        results = await _collect_metrics(page, page_url, ("performance",))
+        return controller._get_formatted(page_url, "performance", results["performance"], _format_performance_metrics)
         
     except Exception as e:
-        logger.error(f"❌ Error capturing performance metrics: {str(e)}")
+        logger.error("❌ Error capturing performance metrics: %s", e)
         # Try to get URL even on error if page object exists
         error_url = page.url if page else "unknown page"
         return f"Failed to capture performance metrics for {error_url}: {str(e)}"
@@ -203,80 +1154,14 @@ async def capture_network_requests() -> str:
     page = None
     try:
         # Get the current page
-        page = await controller.agent.browser_context.get_current_page()
+        page = await controller.current_page()
         page_url = page.url
 
-        # Use JavaScript to get detailed network requests
-        network_data = await page.evaluate("""() => {
-            // Get all resource entries
-            const resources = performance.getEntriesByType('resource');
-            
-            // Organize by type
-            const resourcesByType = {};
-            resources.forEach(resource => {
-                const type = resource.initiatorType || 'other';
-                if (!resourcesByType[type]) {
-                    resourcesByType[type] = [];
-                }
-                resourcesByType[type].push({
-                    url: resource.name,
-                    duration: resource.duration,
-                    size: resource.transferSize || 0,
-                    startTime: resource.startTime
-                });
-            });
-            
-            // Get failed resources from our monitoring namespace
-            const possibleErrors = window.__BROWSER_USE_MONITOR ? window.__BROWSER_USE_MONITOR.networkErrors : [];
-            
-            return {
-                totalRequests: resources.length,
-                byType: resourcesByType,
-                possibleErrors: possibleErrors
-            };
-        }""")
-        
-        # Store the raw data
-        controller._store_metric(page_url, "network", network_data)
-
-        # Format the results for better readability
-        formatted_result = f"""
-        🌐 Network Request Summary for {page_url}:
-        
-        📊 Overview:
-        - Total Requests: {network_data['totalRequests']}
-        """
-        
-        # Add resource types
-        formatted_result += "\n        📑 Requests by Type:"
-        for resource_type, resources in network_data['byType'].items():
-            total_size = sum(r['size'] for r in resources) / 1024
-            formatted_result += f"\n        - {resource_type.capitalize()}: {len(resources)} requests ({total_size:.2f} KB)"
-        
-        # Add most significant requests
-        formatted_result += "\n\n        📋 Largest Requests:"
-        largest_requests = sorted(
-            [r for t in network_data['byType'].values() for r in t], 
-            key=lambda r: r['size'], 
-            reverse=True
-        )[:5]
-        
-        for idx, request in enumerate(largest_requests):
-            formatted_result += f"""
-        {idx+1}. {request['url']} 
-           - Size: {request['size'] / 1024:.2f} KB
-           - Duration: {request['duration']}ms"""
-        
-        # Check for potential network errors
-        if network_data['possibleErrors']:
-            formatted_result += "\n\n        ⚠️ Possible Network Errors:"
-            for idx, error in enumerate(network_data['possibleErrors']):
-                formatted_result += f"\n        {idx+1}. {error}"
-        
-        return formatted_result
+        results = await _collect_metrics(page, page_url, ("network",))
+        return controller._get_formatted(page_url, "network", results["network"], _format_network_requests)
         
     except Exception as e:
-        logger.error(f"❌ Error capturing network requests: {str(e)}")
+        logger.error("❌ Error capturing network requests: %s", e)
         error_url = page.url if page else "unknown page"
         return f"Failed to capture network requests for {error_url}: {str(e)}"
 
@@ -289,249 +1174,41 @@ async def detect_page_anomalies() -> str:
     page = None
     try:
         # Get the current page
-        page = await controller.agent.browser_context.get_current_page()
+        page = await controller.current_page()
         page_url = page.url
 
         # Try to take a full-page screenshot with scrolling and timeout
-        screenshot_b64 = None
-        try:
-            # Add JavaScript to capture a full-page screenshot by scrolling
-            screenshot_b64 = await page.evaluate("""async () => {
-                // Function to scroll down the page in increments
-                const scrollPageAndCapture = async () => {
-                    // Get the initial page dimensions
-                    const fullHeight = Math.max(
-                        document.body.scrollHeight,
-                        document.documentElement.scrollHeight,
-                        document.body.offsetHeight,
-                        document.documentElement.offsetHeight,
-                        document.body.clientHeight,
-                        document.documentElement.clientHeight
-                    );
-                    
-                    // Scroll down in increments
-                    const scrollStep = window.innerHeight / 2; // Half a viewport
-                    let currentScroll = 0;
-                    
-                    // First scroll to top to ensure we start from the beginning
-                    window.scrollTo(0, 0);
-                    await new Promise(r => setTimeout(r, 200)); // Small delay
-                    
-                    // Continue scrolling until we reach the bottom
-                    while (currentScroll < fullHeight) {
-                        window.scrollTo(0, currentScroll);
-                        await new Promise(r => setTimeout(r, 200)); // Wait for content to load
-                        currentScroll += scrollStep;
-                    }
-                    
-                    // Final scroll to the bottom to make sure we've seen everything
-                    window.scrollTo(0, fullHeight);
-                    await new Promise(r => setTimeout(r, 300)); // Final delay
-                    
-                    // Scroll back to top
-                    window.scrollTo(0, 0);
-                    await new Promise(r => setTimeout(r, 200));
-                    
-                    // Signal to the browser-use system that we've done the scrolling
-                    return true;
-                };
-                
-                // Execute the scrolling function
-                return await scrollPageAndCapture();
-            }""")
-            
-            # Now capture the screenshot after scrolling
-            screenshot_task = asyncio.create_task(controller.agent.browser_context.take_screenshot())
-            screenshot_b64 = await asyncio.wait_for(screenshot_task, timeout=15.0)  # 15 second timeout
-            logger.info(f"📸 Full-page screenshot captured successfully for {page_url}")
-        except asyncio.TimeoutError:
-            logger.warning(f"⚠️ Screenshot capture timed out for {page_url}, continuing without screenshot")
-        except Exception as screenshot_error:
-            logger.warning(f"⚠️ Screenshot capture failed for {page_url}: {str(screenshot_error)}")
-        
-        # Store screenshot only if successfully captured
-        if screenshot_b64:
-            controller._store_metric(page_url, "screenshot_b64", screenshot_b64)
-        
-        # Use JavaScript to detect various anomalies
-        anomalies = await page.evaluate("""() => {
-            const anomalies = {
-                consoleErrors: window.__BROWSER_USE_MONITOR ? window.__BROWSER_USE_MONITOR.consoleErrors : [],
-                layoutIssues: [],
-                networkIssues: [],
-                performanceIssues: [],
-                accessibilityIssues: []
-            };
-            
-            // Check for layout issues (elements offscreen or overlapping)
-            const allElements = Array.from(document.querySelectorAll('*'));
-            const viewportWidth = window.innerWidth;
-            const viewportHeight = window.innerHeight;
-            
-            // Check for offscreen elements that might be important
-            allElements.forEach(el => {
-                if (el.tagName === 'BUTTON' || el.tagName === 'A' || el.tagName === 'INPUT' || el.tagName === 'SELECT') {
-                    const rect = el.getBoundingClientRect();
-                    if (rect.width > 0 && rect.height > 0) {
-                        if (rect.right < 0 || rect.bottom < 0 || rect.left > viewportWidth || rect.top > viewportHeight) {
-                            const text = el.textContent || el.value || el.id || el.className || el.tagName;
-                            anomalies.layoutIssues.push(`Interactive element offscreen: ${text.trim().substring(0, 50)}`);
-                        }
-                    }
-                }
-            });
-            
-            // Check for network timing anomalies
-            const resources = performance.getEntriesByType('resource');
-            resources.forEach(resource => {
-                if (resource.duration > 2000) {
-                    anomalies.networkIssues.push(`Slow resource (${resource.duration.toFixed(0)}ms): ${resource.name}`);
-                }
-            });
-            
-            // Check for performance issues
-            const timing = performance.timing;
-            if (timing.loadEventEnd - timing.navigationStart > 5000) {
-                anomalies.performanceIssues.push(`Page load time exceeds 5 seconds (${(timing.loadEventEnd - timing.navigationStart)}ms)`);
-            }
-            
-            if (timing.domInteractive - timing.navigationStart > 3000) {
-                anomalies.performanceIssues.push(`Time to interactive exceeds 3 seconds (${(timing.domInteractive - timing.navigationStart)}ms)`);
-            }
-            
-            // Basic accessibility check
-            allElements.forEach(el => {
-                if (el.tagName === 'IMG' && (!el.alt || el.alt === '')) {
-                    anomalies.accessibilityIssues.push(`Image missing alt text: ${el.src}`);
-                }
-            });
-            
-            const inputElements = document.querySelectorAll('input, select, textarea');
-            inputElements.forEach(input => {
-                const label = document.querySelector(`label[for="${input.id}"]`);
-                if (!label && !input.getAttribute('aria-label')) {
-                    const desc = input.id || input.name || input.placeholder || input.tagName;
-                    anomalies.accessibilityIssues.push(`Form control missing label: ${desc}`);
-                }
-            });
-            
-            return anomalies;
-        }""")
-        
-        # Add JavaScript to listen for console errors and network errors for future captures
-        await page.evaluate("""() => {
-            // Initialize our monitoring namespace if not present
-            if (!window.__BROWSER_USE_MONITOR) {
-                window.__BROWSER_USE_MONITOR = {
-                    networkRequests: [],
-                    networkErrors: [],
-                    consoleErrors: [],
-                    initialized: false
-                };
-            }
-            
-            // Set up console error tracking if not already set up
-            if (!window.__BROWSER_USE_MONITOR.initialized) {
-                window.addEventListener('error', (e) => {
-                    window.__BROWSER_USE_MONITOR.consoleErrors.push(`${e.message} at ${e.filename}:${e.lineno}`);
-                });
-                
-                // Override console.error to capture error messages
-                const originalConsoleError = console.error;
-                console.error = function() {
-                    window.__BROWSER_USE_MONITOR.consoleErrors.push(Array.from(arguments).join(' '));
-                    originalConsoleError.apply(console, arguments);
-                };
-                
-                window.__BROWSER_USE_MONITOR.initialized = true;
-            }
-        }""")
-        
-        # Store the raw data
-        controller._store_metric(page_url, "anomalies", anomalies)
-
-        # Format the results
-        formatted_result = f"""
-        🔍 Anomaly Detection for {page_url}:
-        """
+        screenshot_b64 = await _capture_full_page_screenshot(page, page_url)
         
-        # Add screenshot status
-        if screenshot_b64:
-            formatted_result += "\n        📸 Screenshot captured for visual inspection (stored in agent state)"
-        else:
-            formatted_result += "\n        ⚠️ Screenshot capture was skipped or failed"
+        results = await _collect_metrics(page, page_url, ("anomalies",))
         
-        # Count total anomalies
-        total_anomalies = sum(len(issues) for issues in anomalies.values())
+        # Add JavaScript to listen for console errors and network errors for future captures
+        await page.evaluate(_CONSOLE_MONITOR_JS)
         
-        if total_anomalies == 0:
-            formatted_result += "\n        ✅ No anomalies detected! Page appears to be functioning normally."
-        else:
-            formatted_result += f"\n        ⚠️ {total_anomalies} potential issues detected:"
-            
-            # Add console errors
-            if anomalies['consoleErrors']:
-                formatted_result += "\n\n        🛑 Console Errors:"
-                for idx, error in enumerate(anomalies['consoleErrors']):
-                    formatted_result += f"\n        {idx+1}. {error}"
-            
-            # Add layout issues
-            if anomalies['layoutIssues']:
-                formatted_result += "\n\n        📐 Layout Issues:"
-                for idx, issue in enumerate(anomalies['layoutIssues']):
-                    formatted_result += f"\n        {idx+1}. {issue}"
-            
-            # Add network issues
-            if anomalies['networkIssues']:
-                formatted_result += "\n\n        🌐 Network Issues:"
-                for idx, issue in enumerate(anomalies['networkIssues']):
-                    formatted_result += f"\n        {idx+1}. {issue}"
-            
-            # Add performance issues
-            if anomalies['performanceIssues']:
-                formatted_result += "\n\n        ⏱️ Performance Issues:"
-                for idx, issue in enumerate(anomalies['performanceIssues']):
-                    formatted_result += f"\n        {idx+1}. {issue}"
-            
-            # Add accessibility issues
-            if anomalies['accessibilityIssues']:
-                formatted_result += "\n\n        ♿ Accessibility Issues:"
-                for idx, issue in enumerate(anomalies['accessibilityIssues']):
-                    formatted_result += f"\n        {idx+1}. {issue}"
-                    
-        return formatted_result
+        return controller._get_formatted(
+            page_url, "anomalies", results["anomalies"], _format_page_anomalies, screenshot_b64 is not None
+        )
         
     except Exception as e:
-        logger.error(f"❌ Error detecting page anomalies: {str(e)}")
+        logger.error("❌ Error detecting page anomalies: %s", e)
         error_url = page.url if page else "unknown page"
         return f"Failed to detect page anomalies for {error_url}: {str(e)}"
 
 @controller.action('Pause execution')
 async def pause_execution(reason: str) -> str:
     """Pause execution using agent's pause mechanism."""
-    global _agent_resumed
-    
-    if not controller.agent:
+    session = controller.current_session
+    if not session or not session.agent:
         raise ValueError("No agent set in controller")
         
-    print(f"⏸️ Pausing execution: {reason}")
-    logger.info(f"⏸️ Pausing execution: {reason}")
-    
-    # Store current browser state before pausing (to prevent about:blank issue)
-    browser_context = None
-    browser = None
-    if controller.session_id in active_browser_contexts:
-        browser_context = active_browser_contexts[controller.session_id]
-    if controller.session_id in active_browsers:
-        browser = active_browsers[controller.session_id]
+    logger.info("⏸️ Pausing execution: %s", reason)
     
-    # Log the current state for debugging
-    if browser:
-        logger.info(f"📊 Current browser state before pause - session_id: {controller.session_id}")
+    # Keep the agent on the session's browser before pausing (to prevent about:blank issue)
+    browser_sessions.restore_on_agent(session.agent, session.session_id)
     
-    # Set _agent_resumed to False to indicate we're paused
-    _agent_resumed = False
-    logger.info(f"⏸️ Set _agent_resumed = False for session: {controller.session_id}")
+    # Clear the resumed flag to indicate we're paused
+    session.set_resumed(False)
+    logger.info("⏸️ Set resumed = False for session: %s", session.session_id)
     
     # IMPORTANT: Make sure the message doesn't contain multiple pause prefixes
     clean_reason = reason.replace("⏸️ ", "").strip()
@@ -539,14 +1216,9 @@ async def pause_execution(reason: str) -> str:
         clean_reason = clean_reason.replace("CONFIRMATION REQUIRED:", "").strip()
     formatted_reason = f"⏸️ {clean_reason}"
     
-    # Pause the agent but ensure browser state is preserved
-    controller.agent.pause()
-    logger.info(f"⏸️ Agent paused for session: {controller.session_id}")
-    
-    # Make sure browser and context remain active and are not reset
-    if controller.session_id:
-        active_browser_contexts[controller.session_id] = browser_context
-        active_browsers[controller.session_id] = browser
+    # Pause the agent; the browser stays registered in browser_sessions
+    session.agent.pause()
+    logger.info("⏸️ Agent paused for session: %s", session.session_id)
     
     # Return a clean message for the frontend
     return formatted_reason
@@ -556,48 +1228,37 @@ class ResumeRequest(BaseModel):
 
 async def resume_execution(request: ResumeRequest) -> dict:
     """API endpoint to resume agent execution."""
-    global _agent_resumed
-    if not controller.agent:
+    session_id = request.session_id
+    session = controller.sessions.get(session_id)
+    if not session or not session.agent:
         return {"status": "error", "message": "No agent found"}
+    agent = session.agent
     
     # Ensure browser state is preserved
-    session_id = request.session_id
-    if session_id in active_browsers and session_id in active_browser_contexts:
-        logger.info(f"📊 Preserving browser state for session on resume: {session_id}")
-        browser = active_browsers[session_id]
-        browser_context = active_browser_contexts[session_id]
-        
-        # Make sure we're still using the same browser instances
-        if controller.agent.browser != browser:
-            logger.info(f"🔄 Restoring browser instance for session: {session_id}")
-            controller.agent.browser = browser
-            
-        if controller.agent.browser_context != browser_context:
-            logger.info(f"🔄 Restoring browser context for session: {session_id}")
-            controller.agent.browser_context = browser_context
+    browser_sessions.restore_on_agent(agent, session_id)
     
     # First set the flag to true so ongoing processes know we're resumed
-    _agent_resumed = True
-    logger.info(f"✅ Set _agent_resumed = True for session: {session_id}")
+    session.set_resumed(True)
+    logger.info("✅ Set resumed = True for session: %s", session_id)
     
     # Then resume the agent
     try:
-        logger.info(f"▶️ Resuming agent for session: {session_id}")
-        controller.agent.resume()
-        logger.info(f"✅ Agent resumed successfully for session: {session_id}")
+        logger.info("▶️ Resuming agent for session: %s", session_id)
+        agent.resume()
+        logger.info("✅ Agent resumed successfully for session: %s", session_id)
         
         # Small delay to allow agent to process the resume
         await asyncio.sleep(0.2)
         
         # Verify the agent is really resumed
-        if controller.agent._paused:
-            logger.warning(f"⚠️ Agent still shows as paused after resume for session: {session_id}")
+        if agent._paused:
+            logger.warning("⚠️ Agent still shows as paused after resume for session: %s", session_id)
             # Force the paused state to false
-            controller.agent._paused = False
-            logger.info(f"🔧 Forced agent._paused = False for session: {session_id}")
+            agent._paused = False
+            logger.info("🔧 Forced agent._paused = False for session: %s", session_id)
     except Exception as e:
-        logger.error(f"❌ Error resuming agent: {str(e)}")
-        # Even if resume fails, keep _agent_resumed = True so UI can recover
+        logger.error("❌ Error resuming agent: %s", e)
+        # Even if resume fails, keep resumed = True so UI can recover
         return {"status": "error", "message": f"Failed to resume agent: {str(e)}"}
     
     return {"status": "success", "message": "Agent resumed"}
@@ -607,40 +1268,23 @@ class PauseRequest(BaseModel):
 
 async def pause_execution_manually(request: PauseRequest) -> dict:
     """API endpoint to manually pause agent execution."""
-    global _agent_resumed
-    
-    logger.info(f"🖐️ Manual pause requested for session: {request.session_id}")
+    session_id = request.session_id
+    logger.info("🖐️ Manual pause requested for session: %s", session_id)
     
-    if not controller.agent:
+    session = controller.sessions.get(session_id)
+    if not session or not session.agent:
         return {"status": "error", "message": "No agent found"}
     
-    if controller.session_id != request.session_id:
-        return {"status": "error", "message": "Session ID mismatch"}
+    # Keep the agent on the session's browser before pausing
+    browser_sessions.restore_on_agent(session.agent, session_id)
     
-    # Store current browser state before pausing
-    browser_context = None
-    browser = None
-    if controller.session_id in active_browser_contexts:
-        browser_context = active_browser_contexts[controller.session_id]
-    if controller.session_id in active_browsers:
-        browser = active_browsers[controller.session_id]
-    
-    # Log the current state for debugging
-    if browser:
-        logger.info(f"📊 Preserving browser state on manual pause - session_id: {controller.session_id}")
+    # Clear the resumed flag to indicate pause state
+    session.set_resumed(False)
+    logger.info("⏸️ Set resumed = False for manual pause - session_id: %s", session_id)
     
-    # Set _agent_resumed to false to indicate pause state
-    _agent_resumed = False
-    logger.info(f"⏸️ Set _agent_resumed = False for manual pause - session_id: {controller.session_id}")
-    
-    # Pause the agent but ensure browser state is preserved
-    controller.agent.pause()
-    logger.info(f"⏸️ Agent manually paused for session: {controller.session_id}")
-    
-    # Make sure browser and context remain active and are not reset
-    if controller.session_id:
-        active_browser_contexts[controller.session_id] = browser_context
-        active_browsers[controller.session_id] = browser
+    # Pause the agent; the browser stays registered in browser_sessions
+    session.agent.pause()
+    logger.info("⏸️ Agent manually paused for session: %s", session_id)
     
     return {"status": "success", "message": "Agent manually paused for user control"}
 
@@ -655,119 +1299,85 @@ async def get_session_summary() -> str:
 
     try:
         # Get the current page
-        page = await controller.agent.browser_context.get_current_page()
+        page = await controller.current_page()
         current_url = page.url
 
-        # First call all the monitoring tools to collect fresh data
-        # Use try/except for each tool to ensure one failure doesn't stop the entire process
-        
-        print(f"📊 Collecting performance metrics for {current_url}")
-        try:
-            await capture_performance_metrics()
-        except Exception as e:
-            logger.error(f"❌ Error collecting performance metrics: {str(e)}")
-        
-        print(f"🌐 Collecting network requests for {current_url}")
-        try:
-            await capture_network_requests()
-        except Exception as e:
-            logger.error(f"❌ Error collecting network requests: {str(e)}")
-        
-        print(f"🔍 Running anomaly detection for {current_url}")
-        try:
-            await detect_page_anomalies()
-        except Exception as e:
-            logger.error(f"❌ Error during anomaly detection: {str(e)}")
-        
-        print(f"🔄 Checking real-time network activity for {current_url}")
-        try:
-            await get_real_time_network_activity()
-        except Exception as e:
-            logger.error(f"❌ Error checking real-time network activity: {str(e)}")
+        # First collect fresh data
+        # Use try/except for each step to ensure one failure doesn't stop the entire process
         
-        # Short delay to ensure all data is properly stored
-        await asyncio.sleep(0.5)
+        # The screenshot scrolls the page, so take it before reading layout metrics
+        logger.debug("📸 Capturing screenshot for %s", current_url)
+        await _capture_full_page_screenshot(page, current_url)
         
-        # Get the session data
+        # The remaining collectors are independent page.evaluate calls, so overlap them
+        logger.debug("📊 Collecting metrics and real-time network activity for %s", current_url)
+        results = await asyncio.gather(
+            _collect_metrics(page, current_url),
+            page.evaluate(_CONSOLE_MONITOR_JS),
+            get_real_time_network_activity(),
+            return_exceptions=True,
+        )
+        for step, result in zip(
+            ("collecting page metrics", "installing console monitor", "checking real-time network activity"),
+            results,
+        ):
+            if isinstance(result, Exception):
+                logger.error("❌ Error %s: %s", step, result)
+        
+        # _collect_metrics stores its results before returning, so no settle delay is needed
         session_data = controller._get_current_session_metrics()
-        pages_visited = session_data.get("pages", {})
-
-        # Initialize a default structure to ensure we always follow the exact format
-        perf_data = {
-            'pageLoadTime': 'N/A',
-            'domContentLoaded': 'N/A',
-            'firstPaint': 'N/A',
-            'firstContentfulPaint': 'N/A',
-            'dnsLookupTime': 'N/A',
-            'tcpConnectionTime': 'N/A',
-            'serverResponseTime': 'N/A',
-            'domProcessingTime': 'N/A',
-            'resourceLoadTime': 'N/A',
-            'resourceStats': {
-                'totalResources': 'N/A',
-                'totalSize': 0,
-                'totalDuration': 'N/A'
-            },
-            'slowestResources': []
-        }
-        
-        network_data = {
-            'totalRequests': 'N/A',
-            'byType': {},
-            'largestRequests': []
-        }
-        
-        anomalies_data = {
-            'consoleErrors': [],
-            'layoutIssues': [],
-            'networkIssues': [],
-            'performanceIssues': [],
-            'accessibilityIssues': []
-        }
+        pages_visited = session_data.pages
+
+        # Start from placeholder values so the report always follows the exact format
+        perf_data = _new_summary_perf_data()
+        network_data = _new_summary_network_data()
+        anomalies_data = _new_summary_anomalies_data()
         
         # Extract actual data if available
-        if current_url in pages_visited:
-            page_metrics = pages_visited[current_url]
+        page_metrics = pages_visited.get(current_url)
+        if page_metrics is not None:
+            if page_metrics.performance is not None:
+                actual_perf = page_metrics.performance
+                # Update perf_data with actual values where available; resourceStats is merged key by key
+                perf_data.update({
+                    key: actual_perf[key]
+                    for key in perf_data.keys() & actual_perf.keys()
+                    if key != 'resourceStats'
+                })
+                if 'resourceStats' in actual_perf:
+                    stats, actual_stats = perf_data['resourceStats'], actual_perf['resourceStats']
+                    stats.update({key: actual_stats[key] for key in stats.keys() & actual_stats.keys()})
             
-            if "performance" in page_metrics:
-                actual_perf = page_metrics["performance"]
-                # Update perf_data with actual values where available
-                for key in perf_data:
-                    if key in actual_perf:
-                        if key == 'resourceStats':
-                            for stat_key in perf_data['resourceStats']:
-                                if stat_key in actual_perf['resourceStats']:
-                                    perf_data['resourceStats'][stat_key] = actual_perf['resourceStats'][stat_key]
-                        else:
-                            perf_data[key] = actual_perf[key]
-                
-                # Handle slowest resources separately
-                if 'slowestResources' in actual_perf:
-                    perf_data['slowestResources'] = actual_perf['slowestResources']
-            
-            if "network" in page_metrics:
-                actual_network = page_metrics["network"]
+            if page_metrics.network is not None:
+                actual_network = page_metrics.network
                 if 'totalRequests' in actual_network:
                     network_data['totalRequests'] = actual_network['totalRequests']
                 if 'byType' in actual_network:
                     network_data['byType'] = actual_network['byType']
+                if 'byTypeTotals' in actual_network:
+                    network_data['byTypeTotals'] = actual_network['byTypeTotals']
                 
-                # Get largest requests
-                largest_requests = []
+                # Get the 5 largest requests without sorting all of them
                 if 'byType' in actual_network:
-                    for type_data in actual_network['byType'].values():
-                        largest_requests.extend(type_data)
-                    largest_requests.sort(key=lambda r: r.get('size', 0), reverse=True)
-                    network_data['largestRequests'] = largest_requests[:5]  # Top 5
+                    network_data['largestRequests'] = heapq.nlargest(
+                        5,
+                        itertools.chain.from_iterable(actual_network['byType'].values()),
+                        key=lambda r: r.get('size', 0)
+                    )
             
-            if "anomalies" in page_metrics:
-                actual_anomalies = page_metrics["anomalies"]
-                for key in anomalies_data:
-                    if key in actual_anomalies and isinstance(actual_anomalies[key], list):
-                        anomalies_data[key] = actual_anomalies[key]
+            if page_metrics.anomalies is not None:
+                actual_anomalies = page_metrics.anomalies
+                anomalies_data.update({
+                    key: actual_anomalies[key]
+                    for key in anomalies_data.keys() & actual_anomalies.keys()
+                    if isinstance(actual_anomalies[key], list)
+                })
         
         # Now format the results in the exact specified structure
-        summary = f"""📊 Page Performance Metrics for {current_url}:
+        resource_stats = perf_data['resourceStats']
+        total_size = resource_stats['totalSize']
+        total_size_kb = total_size / 1024 if isinstance(total_size, (int, float)) else 0.0
+        parts = [f"""📊 Page Performance Metrics for {current_url}:
 
 ⏱️ Timing Metrics:
 - Page Load Time: {perf_data['pageLoadTime']}ms
@@ -785,150 +1395,82 @@ async def get_session_summary() -> str:
 - Resource Loading: {perf_data['resourceLoadTime']}ms
 
 📦 Resource Stats:
-- Total Resources: {perf_data['resourceStats']['totalResources']}
-- Total Size: {float(perf_data['resourceStats']['totalSize']) / 1024 if isinstance(perf_data['resourceStats']['totalSize'], (int, float)) else 0:.2f} KB
-- Total Resource Duration: {perf_data['resourceStats']['totalDuration']}ms
+- Total Resources: {resource_stats['totalResources']}
+- Total Size: {total_size_kb:.2f} KB
+- Total Resource Duration: {resource_stats['totalDuration']}ms
 
-🐢 Top 5 Slowest Resources:"""
+🐢 Top 5 Slowest Resources:"""]
 
         # Add slowest resources
         if perf_data['slowestResources']:
-            for idx, resource in enumerate(perf_data['slowestResources'][:5]):
-                summary += f"""
-{idx+1}. {resource.get('url', 'N/A')} 
+            parts.append("".join(f"""
+{idx}. {resource.get('url', 'N/A')} 
    - Duration: {resource.get('duration', 'N/A')}ms
    - Size: {resource.get('size', 0) / 1024:.2f} KB
-   - Type: {resource.get('type', 'N/A')}"""
+   - Type: {resource.get('type', 'N/A')}""" for idx, resource in enumerate(perf_data['slowestResources'][:5], 1)))
         else:
-            summary += "\n- No resource data available"
+            parts.append("\n- No resource data available")
         
         # Network summary
-        summary += f"""
+        parts.append(f"""
 
 🌐 Network Request Summary for {current_url}:
 
 📊 Overview:
 - Total Requests: {network_data['totalRequests']}
 
-📑 Requests by Type:"""
+📑 Requests by Type:""")
 
         # Add request types
-        if network_data['byType']:
-            for type_name, type_data in network_data['byType'].items():
-                total_size = sum(r.get('size', 0) for r in type_data) / 1024
-                summary += f"\n- {type_name.capitalize()}: {len(type_data)} requests ({total_size:.2f} KB)"
+        if network_data['byTypeTotals']:
+            for type_name, totals in network_data['byTypeTotals'].items():
+                parts.append(f"\n- {type_name.capitalize()}: {totals['count']} requests ({totals['totalSize'] / 1024:.2f} KB)")
         else:
-            summary += "\n- No request type data available"
+            parts.append("\n- No request type data available")
         
-        summary += "\n\n📋 Largest Requests:"
+        parts.append("\n\n📋 Largest Requests:")
         
         # Add largest requests
         if network_data['largestRequests']:
-            for idx, request in enumerate(network_data['largestRequests']):
-                summary += f"""
-{idx+1}. {request.get('url', 'N/A')} 
+            parts.append("".join(f"""
+{idx}. {request.get('url', 'N/A')} 
    - Size: {request.get('size', 0) / 1024:.2f} KB
-   - Duration: {request.get('duration', 'N/A')}ms"""
+   - Duration: {request.get('duration', 'N/A')}ms""" for idx, request in enumerate(network_data['largestRequests'], 1)))
         else:
-            summary += "\n- No largest request data available"
+            parts.append("\n- No largest request data available")
         
         # Anomalies section
-        summary += f"""
+        parts.append(f"""
 
-🔍 Top Anomalies for {current_url}:"""
+🔍 Top Anomalies for {current_url}:""")
         
         # Count total anomalies
         total_anomalies = sum(len(issues) for issues in anomalies_data.values())
         
         if total_anomalies > 0:
-            # Add console errors
-            if anomalies_data['consoleErrors']:
-                summary += "\n\n🛑 Console Errors:"
-                for idx, error in enumerate(anomalies_data['consoleErrors'][:5]):
-                    summary += f"\n{idx+1}. {error}"
-            
-            # Add layout issues
-            if anomalies_data['layoutIssues']:
-                summary += "\n\n📐 Layout Issues:"
-                for idx, issue in enumerate(anomalies_data['layoutIssues'][:5]):
-                    summary += f"\n{idx+1}. {issue}"
-            
-            # Add network issues
-            if anomalies_data['networkIssues']:
-                summary += "\n\n🌐 Network Issues:"
-                for idx, issue in enumerate(anomalies_data['networkIssues'][:5]):
-                    summary += f"\n{idx+1}. {issue}"
-            
-            # Add performance issues
-            if anomalies_data['performanceIssues']:
-                summary += "\n\n⏱️ Performance Issues:"
-                for idx, issue in enumerate(anomalies_data['performanceIssues'][:5]):
-                    summary += f"\n{idx+1}. {issue}"
-            
-            # Add accessibility issues
-            if anomalies_data['accessibilityIssues']:
-                summary += "\n\n♿ Accessibility Issues:"
-                for idx, issue in enumerate(anomalies_data['accessibilityIssues'][:5]):
-                    summary += f"\n{idx+1}. {issue}"
+            # Top 5 issues per category
+            for key, header in _ANOMALY_SECTIONS:
+                issues = anomalies_data[key][:5]
+                if issues:
+                    parts.append(f"\n\n{header}")
+                    parts.extend(f"\n{idx}. {issue}" for idx, issue in enumerate(issues, 1))
         else:
-            summary += "\n\n✅ No anomalies detected on this page!"
-        
-        # Store the generated report in the session metrics for later access
-        controller._store_metric(current_url, "full_report", summary)
-        
-        # Print the full report for debugging
-        print(f"\n==== FULL PERFORMANCE REPORT ====\n{summary}\n================================")
-        
-        # Format with clear visual markers to ensure it displays well in the UI
-        formatted_summary = f"""
-============ PERFORMANCE METRICS REPORT ============
-
-{summary}
-
-=================================================="""
+            parts.append("\n\n✅ No anomalies detected on this page!")
         
-        return formatted_summary
+        summary = "".join(parts)
         
-    except Exception as e:
-        logger.error(f"❌ Error generating session summary: {str(e)}")
-        # Even on error, return a formatted response with placeholders
-        error_report = f"""📊 Page Performance Metrics for {page.url if page else "unknown"}:
-
-⏱️ Timing Metrics:
-- Page Load Time: N/A (Error occurred)
-- DOM Content Loaded: N/A
-- First Paint: N/A
-- First Contentful Paint: N/A
-
-🔄 Connection Metrics:
-- DNS Lookup: N/A
-- TCP Connection: N/A
-- Server Response: N/A
-
-⚙️ Processing Metrics:
-- DOM Processing: N/A
-- Resource Loading: N/A
-
-📦 Resource Stats:
-- Total Resources: N/A
-- Total Size: 0.00 KB
-- Total Resource Duration: N/A
-
-🐢 Top 5 Slowest Resources:
-- No resource data available
-
-🌐 Network Request Summary:
-📊 Overview:
-- Total Requests: N/A
-
-📑 Requests by Type:
-- No request type data available
-
-📋 Largest Requests:
-- No largest request data available
-
-🔍 Top Anomalies:
-⚠️ Error generating report: {str(e)}"""
+        # Store the generated report in the session metrics for later access
+        controller._store_metric(current_url, "full_report", summary)
+        
+        # Format with clear visual markers to ensure it displays well in the UI
+        formatted_summary = "".join((_SUMMARY_REPORT_HEADER, summary, _SUMMARY_REPORT_FOOTER))
+        
+        return formatted_summary
+        
+    except Exception as e:
+        logger.error("❌ Error generating session summary: %s", e)
+        # Even on error, return a formatted response with placeholders
+        error_report = f"📊 Page Performance Metrics for {page.url if page else 'unknown'}:\n\n{_ERROR_REPORT_BODY}{e}"
         
         # Store the error report for consistency
         if page:
@@ -943,79 +1485,73 @@ def show_performance_metrics() -> str:
     try:
         # First try to get any existing full report from the session data
         session_data = controller._get_current_session_metrics()
-        pages = session_data.get("pages", {})
-        
-        # Look for any existing reports
-        for url, page_data in pages.items():
-            if "full_report" in page_data:
-                logger.info(f"✅ Found existing performance report for {url}")
-                return page_data["full_report"]
         
-        # If we don't have a full report, try to create a basic report from available data
-        best_url = None
-        best_metrics = None
+        # Return the most recently stored report
+        url, full_report = session_data.latest_report()
+        if full_report is not None:
+            logger.info("✅ Found existing performance report for %s", url)
+            return full_report
         
-        # Find the page with the most metrics
-        for url, page_data in pages.items():
-            metric_count = len(page_data)
-            if best_url is None or metric_count > len(best_metrics):
-                best_url = url
-                best_metrics = page_data
+        # If we don't have a full report, try to create a basic report from the page with the most metrics
+        best_url = session_data.richest_page_url
+        best_metrics = session_data.pages.get(best_url) if best_url else None
         
         if best_url and best_metrics:
-            logger.info(f"📊 Creating basic report for {best_url} from available metrics")
+            logger.info("📊 Creating basic report for %s from available metrics", best_url)
             
             # Create a formatted report from whatever metrics we have
-            report = f"""📊 Page Performance Metrics for {best_url}:
+            parts = [f"""📊 Page Performance Metrics for {best_url}:
 
-"""
+"""]
             
             # Add performance data if available
-            if "performance" in best_metrics:
-                perf = best_metrics["performance"]
-                report += """⏱️ Timing Metrics:
-"""
+            if best_metrics.performance is not None:
+                perf = best_metrics.performance
+                parts.append("""⏱️ Timing Metrics:
+""")
                 # Add whatever performance metrics are available
                 if "pageLoadTime" in perf:
-                    report += f"- Page Load Time: {perf['pageLoadTime']}ms\n"
+                    parts.append(f"- Page Load Time: {perf['pageLoadTime']}ms\n")
                 if "domContentLoaded" in perf:
-                    report += f"- DOM Content Loaded: {perf['domContentLoaded']}ms\n"
+                    parts.append(f"- DOM Content Loaded: {perf['domContentLoaded']}ms\n")
                 if "firstPaint" in perf:
-                    report += f"- First Paint: {perf['firstPaint']}ms\n"
+                    parts.append(f"- First Paint: {perf['firstPaint']}ms\n")
                 if "firstContentfulPaint" in perf:
-                    report += f"- First Contentful Paint: {perf['firstContentfulPaint']}ms\n"
+                    parts.append(f"- First Contentful Paint: {perf['firstContentfulPaint']}ms\n")
                 
                 # Add resource info if available
                 if "resourceStats" in perf:
                     stats = perf["resourceStats"]
-                    report += f"""
+                    parts.append(f"""
 📦 Resource Stats:
 - Total Resources: {stats.get('totalResources', 'N/A')}
 - Total Size: {float(stats.get('totalSize', 0)) / 1024:.2f} KB
 - Total Duration: {stats.get('totalDuration', 'N/A')}ms
-"""
+""")
             
             # Add network data if available
-            if "network" in best_metrics:
-                network = best_metrics["network"]
-                report += f"""
+            if best_metrics.network is not None:
+                network = best_metrics.network
+                parts.append(f"""
 🌐 Network Request Summary:
 - Total Requests: {network.get('totalRequests', 'N/A')}
-"""
+""")
             
             # Add anomalies if available
-            if "anomalies" in best_metrics:
-                anomalies = best_metrics["anomalies"]
+            if best_metrics.anomalies is not None:
+                anomalies = best_metrics.anomalies
                 total_issues = sum(len(issues) for k, issues in anomalies.items() if isinstance(issues, list))
                 
-                report += f"""
+                parts.append(f"""
 🔍 Anomalies Detected: {total_issues}
-"""
+""")
                 
                 # Add some details about the anomalies
                 for category, issues in anomalies.items():
                     if isinstance(issues, list) and len(issues) > 0:
-                        report += f"- {len(issues)} {category}\n"
+                        parts.append(f"- {len(issues)} {category}\n")
+            
+            report = "".join(parts)
             
             # Store this report for future reference
             controller._store_metric(best_url, "full_report", report)
@@ -1033,7 +1569,7 @@ To collect detailed metrics, please try:
 These commands will analyze the current page and gather performance data."""
         
     except Exception as e:
-        logger.error(f"❌ Error in show_performance_metrics: {str(e)}")
+        logger.error("❌ Error in show_performance_metrics: %s", e)
         return f"""📊 Performance Metrics:
 
 ⚠️ Error retrieving performance data: {str(e)}
@@ -1041,37 +1577,70 @@ These commands will analyze the current page and gather performance data."""
 To collect detailed metrics, please try again with:
 "Generate performance report" """
 
+# Banner around a final report that browser_use_agent re-yields on exit
+_FINAL_REPORT_HEADER = "\n----------- FINAL PERFORMANCE REPORT -----------\n\n"
+_FINAL_REPORT_FOOTER = "\n\n---------------------------------------"
+
+# Substrings that mark a streamed AIMessage as the final report or as agent state
+_REPORT_MARKERS = ("📊", "<div", "PERFORMANCE REPORT")
+_SPECIAL_MARKERS = ("*Memory*:", "*Next Goal*:", "*Previous Goal*:")
+
+
+def _contains_any(content, markers: tuple) -> bool:
+    """True if any marker occurs in content; stops at the first hit."""
+    if not content:
+        return False
+    for marker in markers:
+        if marker in content:
+            return True
+    return False
+
+
+def _is_done_action(action_model) -> bool:
+    """True if the LLM set the 'done' action, checked without dumping the whole action model."""
+    return "done" in action_model.model_fields_set and getattr(action_model, "done", None) is not None
+
+def _put_all(queue: asyncio.Queue, items) -> None:
+    """Puts several items on the queue from one loop callback, keeping them adjacent."""
+    for item in items:
+        queue.put_nowait(item)
+
 def yield_data(
     browser_state: "BrowserState", agent_output: "AgentOutput", step_number: int
 ):
     """Callback function for each step - modified to ensure action memory appears"""
+    loop = asyncio.get_running_loop()
+    queue = controller.queue
+    
+    def push(*items):
+        loop.call_soon_threadsafe(_put_all, queue, items)
+    
+    # Nothing to emit for a step without state text or actions
+    state = agent_output.current_state
+    if not (agent_output.action or state.memory or state.next_goal
+            or (step_number > 2 and state.evaluation_previous_goal)):
+        return
+    
     try:
         # Always log for debugging
-        logger.info(f"🔄 yield_data called for step {step_number}")
-        
-        # Add a local static variable to track if we've already processed a done action
-        if not hasattr(yield_data, "_done_processed"):
-            yield_data._done_processed = False
+        logger.info("🔄 yield_data called for step %s", step_number)
         
         # Format Previous Goal (only for steps after the first few)
-        if step_number > 2 and agent_output.current_state.evaluation_previous_goal:
-            message = AIMessage(content=f"*Previous Goal*:\n{agent_output.current_state.evaluation_previous_goal}")
-            asyncio.get_event_loop().call_soon_threadsafe(queue.put_nowait, message)
-            asyncio.get_event_loop().call_soon_threadsafe(queue.put_nowait, {"stop": True})
+        if step_number > 2 and state.evaluation_previous_goal:
+            message = AIMessage(content=f"*Previous Goal*:\n{state.evaluation_previous_goal}")
+            push(message, {"stop": True})
             logger.info("✅ Sent Previous Goal")
         
         # Format Memory - Always show this
-        if agent_output.current_state.memory:
-            message = AIMessage(content=f"*Memory*:\n{agent_output.current_state.memory}")
-            asyncio.get_event_loop().call_soon_threadsafe(queue.put_nowait, message)
-            asyncio.get_event_loop().call_soon_threadsafe(queue.put_nowait, {"stop": True})
+        if state.memory:
+            message = AIMessage(content=f"*Memory*:\n{state.memory}")
+            push(message, {"stop": True})
             logger.info("✅ Sent Memory")
         
         # Format Next Goal - Always show this
-        if agent_output.current_state.next_goal:
-            message = AIMessage(content=f"*Next Goal*:\n{agent_output.current_state.next_goal}")
-            asyncio.get_event_loop().call_soon_threadsafe(queue.put_nowait, message)
-            asyncio.get_event_loop().call_soon_threadsafe(queue.put_nowait, {"stop": True})
+        if state.next_goal:
+            message = AIMessage(content=f"*Next Goal*:\n{state.next_goal}")
+            push(message, {"stop": True})
             logger.info("✅ Sent Next Goal")
         
         # Format Tool calls (from actions)
@@ -1079,46 +1648,36 @@ def yield_data(
         tool_outputs = []
         
         # First check if any 'done' action is in the current step
-        has_done_action = False
-        for action_model in agent_output.action:
-            for key, value in action_model.model_dump().items():
-                if key == "done" and value:
-                    has_done_action = True
-                    break
-            if has_done_action:
-                break
+        has_done_action = any(_is_done_action(action_model) for action_model in agent_output.action)
                 
         # If we have a done action and already processed one before, skip processing this entire step
-        if has_done_action and (yield_data._done_processed or controller.finished):
+        if has_done_action and controller.finished:
             logger.info("🛑 Skipping duplicate done action in step processing")
             return
             
         # Process each action model
         for action_model in agent_output.action:
-            logger.info(f"🔧 Processing action: {action_model}")
-            for key, value in action_model.model_dump().items():
+            logger.info("🔧 Processing action: %s", action_model)
+            # Only the fields the LLM set are populated; dump just those params
+            for key in action_model.model_fields_set:
+                param = getattr(action_model, key)
+                value = param.model_dump() if param is not None else None
                 if value:
                     if key == "done":
                         # When the agent is done, show the completion message
-                        logger.info(f"✅ Agent completed task: {value['text']}")
+                        logger.info("✅ Agent completed task: %s", value['text'])
                         
                         # Check if controller is already finished to prevent multiple reports
-                        if controller.finished or yield_data._done_processed:
+                        if controller.finished:
                             logger.info("⏭️ Controller already finished, skipping report generation")
                             # Just send the done message without additional report
                             done_message = f"<div style='font-size:16px;padding:10px;'>✅ {value['text']}</div>"
-                            asyncio.get_event_loop().call_soon_threadsafe(
-                                queue.put_nowait, AIMessage(content=done_message)
-                            )
-                            logger.info(f"✅ Sent basic done message: {done_message[:100]}...")
-                            asyncio.get_event_loop().call_soon_threadsafe(
-                                queue.put_nowait, {"stop": True}
-                            )
+                            push(AIMessage(content=done_message), {"stop": True})
+                            logger.info("✅ Sent basic done message: %s...", done_message[:100])
                             continue
                             
                         # Set controller as finished before generating report
                         controller.finished = True
-                        yield_data._done_processed = True
                         
                         # Try to get a performance report to combine with the done message
                         try:
@@ -1131,94 +1690,71 @@ def yield_data(
                                 combined_message = f"{done_message}\n\n{report_message}"
                                 
                                 # Log the combined message length for debugging
-                                logger.info(f"📏 Combined message length: {len(combined_message)}")
-                                logger.info(f"📄 First 100 chars: {combined_message[:100]}...")
+                                logger.info("📏 Combined message length: %d", len(combined_message))
+                                logger.info("📄 First 100 chars: %s...", combined_message[:100])
                                 
                                 # Send the combined message
-                                asyncio.get_event_loop().call_soon_threadsafe(
-                                    queue.put_nowait, AIMessage(content=combined_message)
-                                )
-                                asyncio.get_event_loop().call_soon_threadsafe(
-                                    queue.put_nowait, {"stop": True}
-                                )
+                                push(AIMessage(content=combined_message), {"stop": True})
                                 return
                         except Exception as e:
-                            logger.error(f"❌ Error generating report in done action: {str(e)}")
+                            logger.error("❌ Error generating report in done action: %s", e)
                         
                         # If we couldn't generate a report, just send the done message
-                        asyncio.get_event_loop().call_soon_threadsafe(
-                            queue.put_nowait, AIMessage(content=value["text"])
-                        )
-                        asyncio.get_event_loop().call_soon_threadsafe(
-                            queue.put_nowait, {"stop": True}
-                        )
+                        push(AIMessage(content=value["text"]), {"stop": True})
                             
                     else:
                         # For other actions, create a tool call
-                        id = str(uuid.uuid4())
-                        logger.info(f"🔧 Creating tool call for {key} with ID {id}")
+                        session = controller.current_session
+                        call_id = f"tool_call_{session.session_id}_{next(session.tool_call_seq)}"
+                        logger.info("🔧 Creating tool call for %s with ID %s", key, call_id)
                         value = {k: v for k, v in value.items() if v is not None}
                         tool_calls.append(
-                            {"name": key, "args": value, "id": f"tool_call_{id}"}
+                            {"name": key, "args": value, "id": call_id}
                         )
                         tool_outputs.append(
-                            ToolMessage(content="", tool_call_id=f"tool_call_{id}")
+                            ToolMessage(content="", tool_call_id=call_id)
                         )
         
         # Send tool calls if there are any
         if tool_calls:
-            logger.info(f"🔧 Sending {len(tool_calls)} tool calls")
-            asyncio.get_event_loop().call_soon_threadsafe(
-                queue.put_nowait, AIMessage(content="", tool_calls=tool_calls)
-            )
-            for tool_output in tool_outputs:
-                asyncio.get_event_loop().call_soon_threadsafe(queue.put_nowait, tool_output)
+            logger.info("🔧 Sending %d tool calls", len(tool_calls))
+            push(AIMessage(content="", tool_calls=tool_calls), *tool_outputs)
     
     except Exception as e:
-        logger.error(f"❌ Error in yield_data: {str(e)}")
+        logger.error("❌ Error in yield_data: %s", e)
         # Try to recover by sending a basic message
         try:
-            asyncio.get_event_loop().call_soon_threadsafe(
-                queue.put_nowait, AIMessage(content=f"Error processing agent step: {str(e)}")
-            )
+            push(AIMessage(content=f"Error processing agent step: {str(e)}"))
         except:
             pass
 
 def yield_done(history: "AgentHistoryList"):
     """Callback when the agent completes its task."""
+    loop = asyncio.get_running_loop()
+    queue = controller.queue
+    
+    def push(*items):
+        loop.call_soon_threadsafe(_put_all, queue, items)
+    
     try:
         # Always log for debugging
-        logger.info(f"🔄 yield_done called, task completed")
-        
-        # Check if we've already processed a done action via the yield_data function
-        if hasattr(yield_data, "_done_processed") and yield_data._done_processed:
-            logger.info("⏭️ Done action already processed in yield_data, skipping yield_done processing")
-            
-            # Don't send END signal here - let the main loop handle that
-            # This prevents cutting off the report that might still be in the queue
-            logger.info("⏸️ Not sending END signal immediately to allow report processing")
-            return
+        logger.info("🔄 yield_done called, task completed")
         
-        # Check if controller is already finished - if so, skip duplicate report
+        # Check if the done action was already handled - if so, skip duplicate report
         if controller.finished:
             logger.info("⏭️ Controller already finished, skipping duplicate report in yield_done")
             
-            # Still signal the end of the agent's work, but with a small delay
+            # Still signal the end of the agent's work; the queue is FIFO, so anything
+            # pushed before is consumed first
             try:
-                # Use a small delay to ensure any pending messages are processed first
-                loop = asyncio.get_event_loop()
-                loop.call_later(1.0, lambda: asyncio.get_event_loop().call_soon_threadsafe(
-                    queue.put_nowait, "END"))
-                logger.info("✅ Scheduled END signal in yield_done with delay")
+                push("END")
+                logger.info("✅ Sent END signal in yield_done")
             except Exception as e:
-                logger.error(f"❌ Error scheduling END signal in yield_done: {str(e)}")
+                logger.error("❌ Error scheduling END signal in yield_done: %s", e)
             return
         
-        # Mark controller as finished and the done action as processed
+        # Mark controller as finished so the done action is only handled once
         controller.finished = True
-        if hasattr(yield_data, "_done_processed"):
-            yield_data._done_processed = True
-            logger.info("✅ Marked yield_data._done_processed = True from yield_done")
         
         # Try to get the performance report using our specialized function
         try:
@@ -1232,22 +1768,14 @@ def yield_done(history: "AgentHistoryList"):
             combined_message = f"{completion_message}\n\n{report}"
             
             # Log what we're sending
-            logger.info(f"📊 Sending combined completion message with performance report (length: {len(combined_message)})")
-            print(f"🚨 YIELD_DONE SENDING COMBINED MESSAGE WITH REPORT (LENGTH: {len(combined_message)})")
-            
-            # Send the combined message
-            asyncio.get_event_loop().call_soon_threadsafe(
-                queue.put_nowait, AIMessage(content=combined_message)
-            )
+            logger.info("📊 Sending combined completion message with performance report (length: %d)", len(combined_message))
             
-            # Add a delay before sending END
-            loop = asyncio.get_event_loop()
-            loop.call_later(1.0, lambda: asyncio.get_event_loop().call_soon_threadsafe(
-                queue.put_nowait, "END"))
-            logger.info("⏱️ Scheduled END signal after report with 1s delay")
+            # Send the combined message, followed by END in the same callback
+            push(AIMessage(content=combined_message), "END")
+            logger.info("✅ Sent END signal after report")
             return
         except Exception as e:
-            logger.error(f"❌ Error generating report in yield_done: {str(e)}")
+            logger.error("❌ Error generating report in yield_done: %s", e)
             
             # If report generation fails, send a basic message
             basic_message = """
@@ -1259,26 +1787,19 @@ def yield_done(history: "AgentHistoryList"):
     </p>
 </div>
 """
-            asyncio.get_event_loop().call_soon_threadsafe(
-                queue.put_nowait, AIMessage(content=basic_message)
-            )
-            
-            # Send END with a small delay
-            loop = asyncio.get_event_loop()
-            loop.call_later(0.5, lambda: asyncio.get_event_loop().call_soon_threadsafe(
-                queue.put_nowait, "END"))
-            logger.info("⏱️ Scheduled END signal after basic message with 0.5s delay")
+            push(AIMessage(content=basic_message), "END")
+            logger.info("✅ Sent END signal after basic message")
             return
             
     except Exception as e:
-        logger.error(f"❌ Error in yield_done: {str(e)}")
+        logger.error("❌ Error in yield_done: %s", e)
     
     # If we reached here, something went wrong, still signal the end of the agent's work
     try:
-        asyncio.get_event_loop().call_soon_threadsafe(queue.put_nowait, "END")
+        push("END")
         logger.info("✅ Sent END signal in yield_done (fallback)")
     except Exception as e:
-        logger.error(f"❌ Error sending END signal in yield_done: {str(e)}")
+        logger.error("❌ Error sending END signal in yield_done: %s", e)
 
 async def browser_use_agent(
     model_config: ModelConfig,
@@ -1287,65 +1808,54 @@ async def browser_use_agent(
     session_id: str,
     cancel_event: Optional[asyncio.Event] = None,
 ) -> AsyncIterator[str]:
-    global _agent_resumed
     global session_metrics_storage # Access global storage
-    global queue  # Make sure queue is accessible globally
 
     logger.info("🚀 Starting browser_use_agent with session_id: %s", session_id)
-    logger.info("🔧 Model config: %s", model_config)
-    logger.info("⚙️ Agent settings: %s", agent_settings)
-
-    # Reset static variables for yield_data function
-    if hasattr(yield_data, "_done_processed"):
-        yield_data._done_processed = False
-        logger.info("🔄 Reset yield_data._done_processed flag")
+    # The full settings include the system prompt, so only dump them at debug level
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🔧 Model config: %s", model_config)
+        logger.debug("⚙️ Agent settings: %s", agent_settings)
 
     # Clear previous metrics for this session ID at the start of a new run
     if session_id in session_metrics_storage:
         logger.info("🧹 Clearing previous session metrics for session_id: %s", session_id)
-        del session_metrics_storage[session_id]
-    # Re-initialize defaultdict entry
-    session_metrics_storage[session_id]
+    session_metrics_storage[session_id] = SessionMetrics()
+    await _clear_session_screenshots(session_id)
 
     llm, use_vision = create_llm(model_config)
     logger.info("🤖 Created LLM instance")
 
-    # Set the session_id in the controller
-    controller.set_session_id(session_id) # This will also ensure the session exists in storage
-    
-    # Explicitly reset the finished flag for this run
-    controller.finished = False
-    logger.info("🔄 Explicitly reset controller.finished flag for new agent run")
+    # Bind the session to this task; this also resets its finished flag
+    session = controller.set_session_id(session_id) # This will also ensure the session exists in storage
     
     # Reset the resumed flag at the start of a new session
-    _agent_resumed = False
+    session.set_resumed(False)
 
     browser = None
     browser_context = None
-    queue = asyncio.Queue()  # Create a new queue for this session
+    queue = session.queue = asyncio.Queue()  # Create a new queue for this session
 
     # Check if we already have a browser for this session
-    if session_id in active_browsers:
+    if session_id in browser_sessions:
         logger.info("🔄 Reusing existing browser for session: %s", session_id)
-        browser = active_browsers[session_id]
-        browser_context = active_browser_contexts[session_id]
+        browser, browser_context = browser_sessions.get(session_id)
     else:
         # Create a new browser instance
         logger.info("🌐 Creating new browser for session: %s", session_id)
         browser = Browser(
             BrowserConfig(
-                cdp_url=f"{STEEL_CONNECT_URL}?apiKey={STEEL_API_KEY}&sessionId={session_id}"
+                cdp_url=_CDP_BASE + quote_plus(session_id)
             )
         )
         # Use our custom browser context instead of the default one.
         browser_context = BrowserContext(browser=browser)
         
         # Store for future use
-        active_browsers[session_id] = browser
-        active_browser_contexts[session_id] = browser_context
+        browser_sessions.add(session_id, browser, browser_context)
         
         # Set up monitoring hooks
         await setup_browser_monitoring_hooks(browser_context)
+        await _install_collectors(browser_context)
 
     agent = Agent(
         llm=llm,
@@ -1366,8 +1876,6 @@ async def browser_use_agent(
 
     steps = agent_settings.steps or 25
     
-    # Add a flag to track if done was called
-    done_called = False
     # Add a variable to store the final report
     final_report = None
 
@@ -1375,10 +1883,10 @@ async def browser_use_agent(
     logger.info("▶️ Started agent task with %d steps", steps)
 
     # Store special messages until agent is resumed
-    pending_special_messages = []
+    pending_special_messages = deque()
     
-    # Add a flag to track whether we've stored messages while paused
-    has_pending_messages = False
+    # One pending queue.get() is kept across wakeups and only replaced once it yields an item
+    get_task = None
     
     try:
         while True:
@@ -1389,104 +1897,110 @@ async def browser_use_agent(
             if agent._too_many_failures():
                 break
                 
-            # Wait for data from the queue
+            # Wait for data from the queue, waking early for a resume while messages
+            # are held back, a cancellation, or the agent task ending
+            if get_task is None:
+                get_task = asyncio.ensure_future(queue.get())
+            waiters = {get_task}
+            if pending_special_messages:
+                waiters.add(asyncio.ensure_future(session.resume_event.wait()))
+            if cancel_event:
+                waiters.add(asyncio.ensure_future(cancel_event.wait()))
+            if not agent_task.done():
+                waiters.add(agent_task)
             try:
-                # Use a timeout to regularly check the _agent_resumed flag
-                data = await asyncio.wait_for(queue.get(), timeout=0.5)
-            except asyncio.TimeoutError:
+                done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for waiter in waiters:
+                    if waiter is not agent_task and waiter is not get_task and not waiter.done():
+                        waiter.cancel()
+
+            if get_task in done:
+                data = get_task.result()
+                get_task = None
+            else:
                 # Check if agent was resumed while we were waiting
-                if _agent_resumed and has_pending_messages:
+                if session.resumed and pending_special_messages:
                     logger.info("🔄 Agent was resumed while waiting for queue data, releasing pending messages")
-                    for msg in pending_special_messages:
-                        yield msg
-                    pending_special_messages = []
-                    has_pending_messages = False
+                    while pending_special_messages:
+                        yield pending_special_messages.popleft()
                 continue
                 
-            if data == "END":  # You'll need to send this when done
+            is_ai_message = isinstance(data, AIMessage)
+            if not is_ai_message and data == "END":  # You'll need to send this when done
                 break
             
             # Check if agent was resumed - if so, release any pending special messages
-            if _agent_resumed and pending_special_messages:
-                logger.info(f"🔄 Agent resumed, releasing {len(pending_special_messages)} pending messages")
+            if session.resumed and pending_special_messages:
+                logger.info("🔄 Agent resumed, releasing %d pending messages", len(pending_special_messages))
                 # First yield all pending special messages
-                for msg in pending_special_messages:
-                    yield msg
-                pending_special_messages = []  # Clear the pending messages
-                has_pending_messages = False
+                while pending_special_messages:
+                    yield pending_special_messages.popleft()
+            
+            # Tool messages and stop markers are never done, report or special messages
+            if not is_ai_message:
+                yield data
+                continue
+            
+            content = data.content
             
             # Check if this is a completion ('done' action) message or a combined report message
             is_done_or_report_message = (
-                isinstance(data, AIMessage) and 
                 not data.tool_calls and
-                (controller.finished or 
-                 (data.content and ("📊" in data.content or "<div" in data.content or "PERFORMANCE REPORT" in data.content)))
+                (controller.finished or _contains_any(content, _REPORT_MARKERS))
             )
             
             # Log details about the message for debugging
-            if isinstance(data, AIMessage) and data.content:
-                content_preview = data.content[:100] + "..." if len(data.content) > 100 else data.content
-                print(f"🚨 PROCESSING MESSAGE: {content_preview}")
-                print(f"🚨 IS DONE/REPORT: {is_done_or_report_message}, HAS HTML: {'<div' in data.content}, HAS EMOJI: {'📊' in data.content}")
-                
-            # If we've already seen a done message, and this is another one, skip it
-            if is_done_or_report_message and done_called:
-                logger.info("🛑 Skipping duplicate done/report message, agent already completed")
-                continue
+            if content and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("🚨 PROCESSING MESSAGE: %s%s", content[:100], "..." if len(content) > 100 else "")
+                logger.debug("🚨 IS DONE/REPORT: %s, HAS HTML: %s, HAS EMOJI: %s",
+                             is_done_or_report_message, "<div" in content, "📊" in content)
                 
-            # If this is a done or report message, mark that we've seen one
+            # The first done or report message ends the stream
             if is_done_or_report_message:
-                done_called = True
                 logger.info("✅ Detected done/report message, will prevent further processing")
                 
                 # Save as final_report if it contains performance metrics
-                if data.content and "📊" in data.content:
+                if content and "📊" in content:
                     final_report = data
                     logger.info("📊 Saved message as final report")
                 
-                # Yield this message
+                # Yield this message; the generator only resumes once the consumer
+                # has taken it, so the report is already on its way to the UI
                 yield data
                 
-                # Wait for a short time to ensure any report messages get processed
-                # This is crucial to allow the performance report to be displayed
-                logger.info("⏳ Waiting a short time before stopping agent...")
-                await asyncio.sleep(0.5)
-                
                 # Now force stop agent
                 try:
                     logger.info("🛑 Forcing agent to stop after yielding report")
                     # Terminate the task after yielding the message
                     agent.stop()
                     agent_task.cancel()
-                    break
                 except Exception as e:
-                    logger.error(f"❌ Error stopping agent task: {str(e)}")
-                continue
+                    logger.error("❌ Error stopping agent task: %s", e)
+                break
             
             # If this is a special message (Memory, Next Goal, etc)
-            is_special_message = (
-                isinstance(data, AIMessage) and 
-                data.content and (
-                    "*Memory*:" in data.content or 
-                    "*Next Goal*:" in data.content or 
-                    "*Previous Goal*:" in data.content
-                )
-            )
+            is_special_message = _contains_any(content, _SPECIAL_MARKERS)
             
             if is_special_message:
-                if _agent_resumed or agent._paused == False:
+                if session.resumed or agent._paused == False:
                     # If agent is resumed or was never paused, send the message immediately
                     yield data
                 else:
                     # Otherwise, store it for later
                     logger.info("📊 Storing special message for later delivery (agent is paused)")
                     pending_special_messages.append(data)
-                    has_pending_messages = True
             else:
-                # For non-special messages, always yield them unless we already called done
-                if not (done_called and controller.finished):
-                    yield data
+                # Non-special messages are always passed through
+                yield data
     finally:
+        if get_task is not None:
+            get_task.cancel()
+
+        # The run is over, so don't keep its agent, queue, page and screenshots around
+        if controller.drop_session(session_id, session):
+            await _clear_session_screenshots(session_id)
+        
         # Make sure to yield the final report if we have one and haven't sent it yet
         if final_report:
             try:
@@ -1496,18 +2010,13 @@ async def browser_use_agent(
                     # Format it more clearly if it's not already formatted
                     content = final_report.content if isinstance(final_report, AIMessage) else str(final_report)
                     # Create a new message with better formatting
-                    formatted_message = AIMessage(content=f"""
------------ FINAL PERFORMANCE REPORT -----------
-
-{content}
-
----------------------------------------""")
+                    formatted_message = AIMessage(content="".join((_FINAL_REPORT_HEADER, content, _FINAL_REPORT_FOOTER)))
                     yield formatted_message
                 else:
                     # If it's already well-formatted, just yield it as is
                     yield final_report
             except Exception as e:
-                logger.error(f"❌ Error yielding final report: {str(e)}")
+                logger.error("❌ Error yielding final report: %s", e)
                 # Try one more time with simplified formatting
                 try:
                     yield AIMessage(content=f"⚠️ Final Report: {str(final_report)}")
@@ -1523,175 +2032,51 @@ async def browser_use_agent(
             # Send it to the queue directly
             if queue:
                 logger.info("📊 Sending final HTML performance report to queue")
-                # Use the current event loop which we know exists in this context
-                asyncio.get_event_loop().call_soon_threadsafe(
-                    queue.put_nowait, AIMessage(content=html_report)
-                )
-                # Short delay to ensure report is processed
-                await asyncio.sleep(0.5)
-                # Then queue the END signal
-                asyncio.get_event_loop().call_soon_threadsafe(
-                    queue.put_nowait, "END"
-                )
-                logger.info("⏱️ Scheduled END signal after HTML report")
+                # We are on the queue's own loop, so put directly
+                queue.put_nowait(AIMessage(content=html_report))
+                # Then queue the END signal right behind it
+                queue.put_nowait("END")
+                logger.info("⏱️ Queued END signal after HTML report")
             else:
                 logger.warning("⚠️ Queue not available for final report display")
         except Exception as e:
-            logger.error(f"❌ Error generating final report: {str(e)}")
+            logger.error("❌ Error generating final report: %s", e)
             # Try to send END even on error
             if queue:
-                try:
-                    asyncio.get_event_loop().call_soon_threadsafe(
-                        queue.put_nowait, "END"
-                    )
-                except Exception:
-                    pass
-        
-        # Reset the done_processed flag in finally block
-        if hasattr(yield_data, "_done_processed"):
-            yield_data._done_processed = False
-            logger.info("🔄 Reset yield_data._done_processed flag in finally block")
+                queue.put_nowait("END")
         
         # We're intentionally not closing the browser instance here to allow for resuming
         # The browser instances will be managed by the Steel API and cleaned up when the session expires
         pass
 
+async def release_session_state(session_id: str):
+    """Drops everything kept for a session once its Steel session has been released."""
+    controller.drop_session(session_id)
+    controller.finished_sessions.pop(session_id, None)
+    browser_sessions.remove(session_id)
+    session_metrics_storage.pop(session_id, None)
+    await _clear_session_screenshots(session_id)
+
 async def setup_browser_monitoring_hooks(browser_context: BrowserContext):
-    """Setup event listeners for monitoring page navigation and network activity."""
+    """Registers the network/console monitor on every page the context opens, and on the pages already open."""
     try:
-        # Monitor for new pages and navigation events
-        async def on_page_created(page):
-            logger.info(f"📄 New page created: {page.url}")
-            await inject_monitoring_scripts(page)
-            
-            # Set up page event listeners
-            await page.add_event_listener("load", lambda: asyncio.create_task(on_page_load(page)))
-            
-        # Handle page load events
-        async def on_page_load(page):
-            logger.info(f"📄 Page loaded: {page.url}")
+        session = await browser_context.get_session()
+        # Runs before any page script on each new document, so no per-navigation injection is needed
+        await session.context.add_init_script(_MONITOR_INIT_JS)
+        for page in session.context.pages:
             await inject_monitoring_scripts(page)
         
-        # Attach the event listeners to browser context
-        browser_context.on_page_created(on_page_created)
-        
         logger.info("✅ Successfully set up browser monitoring hooks")
     except Exception as e:
-        logger.error(f"❌ Error setting up browser monitoring hooks: {str(e)}")
+        logger.error("❌ Error setting up browser monitoring hooks: %s", e)
 
 async def inject_monitoring_scripts(page):
     """Injects JavaScript into the page to track network requests and console errors."""
     try:
-        await page.evaluate("""() => {
-            // Create a namespace for the browser-use monitoring tools
-            // Only initialize if it doesn't exist yet
-            if (!window.__BROWSER_USE_MONITOR) {
-                window.__BROWSER_USE_MONITOR = {
-                    networkRequests: [],
-                    networkErrors: [],
-                    consoleErrors: [],
-                    initialized: false
-                };
-                
-                console.log('[browser-use] Initializing performance monitoring');
-                
-                // Track XHR requests
-                const originalXhrOpen = XMLHttpRequest.prototype.open;
-                const originalXhrSend = XMLHttpRequest.prototype.send;
-                
-                XMLHttpRequest.prototype.open = function(method, url) {
-                    this.__requestData = { method, url, type: 'xhr', startTime: performance.now(), status: 'pending' };
-                    window.__BROWSER_USE_MONITOR.networkRequests.push(this.__requestData);
-                    return originalXhrOpen.apply(this, arguments);
-                };
-                
-                XMLHttpRequest.prototype.send = function() {
-                    if (this.__requestData) {
-                        const request = this.__requestData;
-                        
-                        this.addEventListener('load', function() {
-                            request.status = this.status;
-                            request.duration = performance.now() - request.startTime;
-                            request.size = parseInt(this.getResponseHeader('Content-Length') || '0');
-                        });
-                        
-                        this.addEventListener('error', function() {
-                            request.status = 'failed';
-                            request.duration = performance.now() - request.startTime;
-                            const errorMsg = `XHR failed: ${request.method} ${request.url}`;
-                            window.__BROWSER_USE_MONITOR.networkErrors.push(errorMsg);
-                        });
-                        
-                        this.addEventListener('timeout', function() {
-                            request.status = 'timeout';
-                            request.duration = performance.now() - request.startTime;
-                            const errorMsg = `XHR timeout: ${request.method} ${request.url}`;
-                            window.__BROWSER_USE_MONITOR.networkErrors.push(errorMsg);
-                        });
-                    }
-                    return originalXhrSend.apply(this, arguments);
-                };
-                
-                // Track fetch requests
-                const originalFetch = window.fetch;
-                window.fetch = function(resource, init) {
-                    const url = typeof resource === 'string' ? resource : resource.url;
-                    const method = init?.method || (typeof resource === 'string' ? 'GET' : resource.method || 'GET');
-                    
-                    const requestData = { 
-                        method, 
-                        url, 
-                        type: 'fetch', 
-                        startTime: performance.now(), 
-                        status: 'pending' 
-                    };
-                    
-                    window.__BROWSER_USE_MONITOR.networkRequests.push(requestData);
-                    
-                    return originalFetch.apply(this, arguments)
-                        .then(response => {
-                            requestData.status = response.status;
-                            requestData.duration = performance.now() - requestData.startTime;
-                            
-                            if (!response.ok) {
-                                const errorMsg = `Fetch error ${response.status}: ${method} ${url}`;
-                                window.__BROWSER_USE_MONITOR.networkErrors.push(errorMsg);
-                            }
-                            
-                            return response;
-                        })
-                        .catch(error => {
-                            requestData.status = 'failed';
-                            requestData.duration = performance.now() - requestData.startTime;
-                            
-                            const errorMsg = `Fetch failed: ${method} ${url} - ${error.message}`;
-                            window.__BROWSER_USE_MONITOR.networkErrors.push(errorMsg);
-                            
-                            throw error;
-                        });
-                };
-                
-                // Track console errors
-                window.addEventListener('error', (e) => {
-                    window.__BROWSER_USE_MONITOR.consoleErrors.push(`${e.message} at ${e.filename}:${e.lineno}`);
-                });
-                
-                // Override console.error to capture error messages
-                const originalConsoleError = console.error;
-                console.error = function() {
-                    window.__BROWSER_USE_MONITOR.consoleErrors.push(Array.from(arguments).join(' '));
-                    originalConsoleError.apply(console, arguments);
-                };
-                
-                window.__BROWSER_USE_MONITOR.initialized = true;
-                console.log('[browser-use] Performance monitoring initialized');
-            } else {
-                console.log('[browser-use] Performance monitoring already initialized');
-            }
-        }""")
+        await page.evaluate(_MONITOR_JS)
         logger.info("Successfully injected monitoring scripts")
     except Exception as e:
-        logger.error(f"Error injecting monitoring scripts: {str(e)}")
+        logger.error("Error injecting monitoring scripts: %s", e)
 
 @controller.action('Get real-time network activity')
 async def get_real_time_network_activity() -> str:
@@ -1701,7 +2086,7 @@ async def get_real_time_network_activity() -> str:
     
     try:
         # Get the current page
-        page = await controller.agent.browser_context.get_current_page()
+        page = await controller.current_page()
         
         # Get the real-time network data
         network_data = await page.evaluate("""() => {
@@ -1715,23 +2100,39 @@ async def get_real_time_network_activity() -> str:
                 };
             }
             
-            // Get the most recent requests (last 20)
-            const recentRequests = window.__BROWSER_USE_MONITOR.networkRequests
-                .slice(-20)
-                .map(req => ({
+            // Get the most recent requests (last 20), projected straight into one array
+            const requests = window.__BROWSER_USE_MONITOR.networkRequests;
+            const start = Math.max(0, requests.length - 20);
+            const recentRequests = new Array(requests.length - start);
+            for (let i = start; i < requests.length; i++) {
+                const req = requests[i];
+                recentRequests[i - start] = {
                     url: req.url,
                     method: req.method,
                     type: req.type,
                     status: req.status,
                     duration: req.duration || 0,
                     startTime: req.startTime
-                }));
+                };
+            }
                 
-            // Calculate some stats
-            const inProgressRequests = window.__BROWSER_USE_MONITOR.networkRequests.filter(req => req.status === 'pending').length;
-            const completedRequests = window.__BROWSER_USE_MONITOR.networkRequests.filter(req => req.status !== 'pending').length;
-            const failedRequests = window.__BROWSER_USE_MONITOR.networkRequests.filter(req => req.status === 'failed' || 
-                (typeof req.status === 'number' && (req.status < 200 || req.status >= 400))).length;
+            // Use the monitor's running counters; count in one pass if it didn't install them
+            let stats = window.__BROWSER_USE_MONITOR.stats;
+            if (!stats) {
+                stats = { total: 0, inProgress: 0, completed: 0, failed: 0 };
+                for (const req of window.__BROWSER_USE_MONITOR.networkRequests) {
+                    stats.total++;
+                    const status = req.status;
+                    if (status === 'pending') {
+                        stats.inProgress++;
+                        continue;
+                    }
+                    stats.completed++;
+                    if (status === 'failed' || (typeof status === 'number' && (status < 200 || status >= 400))) {
+                        stats.failed++;
+                    }
+                }
+            }
             
             // Get errors
             const errors = window.__BROWSER_USE_MONITOR.networkErrors.slice(-10); // Last 10 errors
@@ -1739,17 +2140,17 @@ async def get_real_time_network_activity() -> str:
             return {
                 recentRequests,
                 stats: {
-                    totalTracked: window.__BROWSER_USE_MONITOR.networkRequests.length,
-                    inProgress: inProgressRequests,
-                    completed: completedRequests,
-                    failed: failedRequests
+                    totalTracked: stats.total,
+                    inProgress: stats.inProgress,
+                    completed: stats.completed,
+                    failed: stats.failed
                 },
                 errors
             };
         }""")
         
         # Format the results
-        formatted_result = f"""
+        parts = [f"""
         🌐 Real-time Network Activity for {page.url}:
         
         📊 Current Stats:
@@ -1757,37 +2158,36 @@ async def get_real_time_network_activity() -> str:
         - In Progress: {network_data['stats']['inProgress']}
         - Completed: {network_data['stats']['completed']}
         - Failed: {network_data['stats']['failed']}
-        """
+        """]
         
         # Add recent requests
         if network_data['recentRequests']:
-            formatted_result += "\n        📋 Most Recent Requests:"
+            parts.append("\n        📋 Most Recent Requests:")
             for idx, req in enumerate(reversed(network_data['recentRequests'][:10])):  # Show last 10 in reverse order
                 status_emoji = "✅" if req['status'] >= 200 and req['status'] < 400 else "❌" if req['status'] != 'pending' else "⏳"
-                formatted_result += f"""
+                parts.append(f"""
         {idx+1}. {status_emoji} {req['method']} {req['url']} 
            - Status: {req['status']}
            - Type: {req['type']}
-           - Duration: {req['duration']:.2f}ms"""
+           - Duration: {req['duration']:.2f}ms""")
         
         # Add errors if any
         if network_data['errors']:
-            formatted_result += "\n\n        ⚠️ Recent Network Errors:"
-            for idx, error in enumerate(network_data['errors']):
-                formatted_result += f"\n        {idx+1}. {error}"
+            parts.append("\n\n        ⚠️ Recent Network Errors:")
+            parts.extend(f"\n        {idx}. {error}" for idx, error in enumerate(network_data['errors'], 1))
         
-        return formatted_result
+        return "".join(parts)
         
     except Exception as e:
-        logger.error(f"❌ Error getting real-time network activity: {str(e)}")
+        logger.error("❌ Error getting real-time network activity: %s", e)
         return f"Failed to get real-time network activity: {str(e)}"
 
 @controller.action('Done')
 def done(text: str) -> str:
     """Marks the task as complete and returns any final information."""
     
-    # Always print the raw text for debugging
-    print(f"🚨 DONE ACTION CALLED WITH TEXT: {text}")
+    # Log the raw text for debugging
+    logger.debug("🚨 DONE ACTION CALLED WITH TEXT: %s", text)
     
     # Get the completion message ready
     completion_message = f"✅ {text}"
@@ -1804,12 +2204,11 @@ def done(text: str) -> str:
         combined_message = f"{completion_message}\n\n{report}"
         
         # Log for debugging
-        print(f"🚨 RETURNING COMBINED COMPLETION MESSAGE AND REPORT (LENGTH: {len(combined_message)})")
-        logger.info(f"📊 Successfully combined completion message with performance report (length: {len(combined_message)})")
+        logger.info("📊 Successfully combined completion message with performance report (length: %d)", len(combined_message))
         
         return combined_message
     except Exception as e:
-        logger.error(f"❌ Error calling display_performance_report in done action: {str(e)}")
+        logger.error("❌ Error calling display_performance_report in done action: %s", e)
         # Even if report fails, still return completion message
         return completion_message
 
@@ -1817,13 +2216,14 @@ def done(text: str) -> str:
 async def run_get_session_summary_with_timeout(timeout=20):
     """Try to run get_session_summary with a timeout"""
     try:
-        # Use asyncio.wait_for to implement the timeout
-        return await asyncio.wait_for(get_session_summary(), timeout)
+        # Time out the current task in place rather than wrapping the summary in a new one
+        async with asyncio.timeout(timeout):
+            return await get_session_summary()
     except asyncio.TimeoutError:
-        logger.error(f"❌ Timeout running get_session_summary after {timeout} seconds")
+        logger.error("❌ Timeout running get_session_summary after %s seconds", timeout)
         return None
     except Exception as e:
-        logger.error(f"❌ Error running get_session_summary: {str(e)}")
+        logger.error("❌ Error running get_session_summary: %s", e)
         return None
 
 # Add action to explicitly run the session summary
@@ -1840,7 +2240,7 @@ async def generate_performance_report() -> str:
             # Fallback to get_latest_report if get_session_summary fails
             return get_latest_report()
     except Exception as e:
-        logger.error(f"❌ Error in generate_performance_report: {str(e)}")
+        logger.error("❌ Error in generate_performance_report: %s", e)
         return f"""📊 Page Performance Summary:
 
 ⚠️ Error generating performance report: {str(e)}
@@ -1852,14 +2252,11 @@ async def generate_performance_report() -> str:
 def get_latest_report() -> str:
     """Gets the most recent full report from session data."""
     try:
-        session_data = controller._get_current_session_metrics()
-        pages = session_data.get("pages", {})
-        
-        # Try to find any report
-        for url, page_data in pages.items():
-            if "full_report" in page_data:
-                logger.info(f"✅ Found and returning existing report for {url}")
-                return page_data["full_report"]
+        # Return the most recently stored report
+        url, full_report = controller._find_latest_full_report()
+        if full_report is not None:
+            logger.info("✅ Found and returning existing report for %s", url)
+            return full_report
         
         # If no report found, generate a basic one
         return f"""📊 Page Performance Summary:
@@ -1869,7 +2266,7 @@ No detailed performance metrics available.
 🔍 Please run "Get session exploration summary" to generate detailed metrics."""
     
     except Exception as e:
-        logger.error(f"❌ Error in get_latest_report: {str(e)}")
+        logger.error("❌ Error in get_latest_report: %s", e)
         return f"""📊 Page Performance Summary:
 
 ⚠️ Error retrieving performance data: {str(e)}
@@ -1883,16 +2280,12 @@ def show_complete_performance_report() -> str:
     
     try:
         # Step 1: Try to find an existing report
-        session_data = controller._get_current_session_metrics()
-        pages = session_data.get("pages", {})
-        
-        # Check if we already have a report in any page
-        for url, page_data in pages.items():
-            if "full_report" in page_data:
-                logger.info(f"✅ Found existing full report for {url}")
-                return f"""--- COMPLETE PERFORMANCE REPORT ---
+        url, full_report = controller._find_latest_full_report()
+        if full_report is not None:
+            logger.info("✅ Found existing full report for %s", url)
+            return f"""--- COMPLETE PERFORMANCE REPORT ---
 
-{page_data['full_report']}
+{full_report}
 
 --- END OF REPORT ---
 
@@ -1910,7 +2303,7 @@ No performance report has been generated yet. To generate a detailed report:
 These will analyze the current page's performance, network activity, and potential issues."""
         
     except Exception as e:
-        logger.error(f"❌ Error in show_complete_performance_report: {str(e)}")
+        logger.error("❌ Error in show_complete_performance_report: %s", e)
         return f"""⚠️ Error retrieving performance report: {str(e)}
 
 To generate a performance report, please try:
@@ -1923,62 +2316,90 @@ These commands will analyze the current page and gather detailed metrics."""
 def display_performance_report() -> str:
     """Force-displays the performance report with special formatting to ensure it's visible in the UI."""
     logger.info("🚨 FORCE-DISPLAYING PERFORMANCE REPORT")
-    
-    try:
-        # First try to find an existing report
-        session_data = controller._get_current_session_metrics()
-        pages = session_data.get("pages", {})
-        
-        # Look for any report
-        for url, page_data in pages.items():
-            if "full_report" in page_data:
-                full_report = page_data["full_report"]
-                logger.info(f"✅ Found existing report for {url} to force-display")
-                
-                # Use special formatting that should be visible in the UI
-                report_message = f"""
+    # The done step and the done callback both ask for this; render it once per metrics change
+    return controller._cached_report("display_performance_report", _render_performance_report)
+
+# Styled block display_performance_report puts around a text report
+_HTML_REPORT_HEAD = """
 <div style="padding:20px; background:#f5f5f5; border:2px solid #ccc; border-radius:10px; margin:20px 0;">
     <h2 style="color:#2c3e50; text-align:center; border-bottom:1px solid #ccc; padding-bottom:10px; margin-bottom:15px;">🚀 PERFORMANCE REPORT 🚀</h2>
     <pre style="white-space:pre-wrap; font-family:monospace; background:#fff; padding:15px; border-radius:5px; font-size:14px; line-height:1.4;">
-{full_report}
+"""
+_HTML_REPORT_TAIL = """
     </pre>
 </div>
 """
-                # Print for debugging
-                print(f"🚨 FORCE-DISPLAYING REPORT WITH LENGTH: {len(report_message)}")
-                return report_message
+
+def _wrap_html_report(report: str) -> str:
+    """Wraps a text report in the styled block display_performance_report shows in the UI."""
+    # The report is plain text; escape it so "<" or "&" in page data can't break the markup
+    return "".join((_HTML_REPORT_HEAD, escape(report), _HTML_REPORT_TAIL))
+
+# Shown by display_performance_report when no report can be found or generated
+_NO_REPORT_HTML = """
+<div style="padding:20px; background:#f5f5f5; border:2px solid #ccc; border-radius:10px; margin:20px 0;">
+    <h2 style="color:#2c3e50; text-align:center; border-bottom:1px solid #ccc; padding-bottom:10px; margin-bottom:15px;">🚀 PERFORMANCE REPORT 🚀</h2>
+    <p style="font-size:16px; line-height:1.5; text-align:center;">
+        No performance report has been generated yet.<br/>
+        Try running "Get session exploration summary" to generate metrics.
+    </p>
+</div>
+"""
+
+# Report stylesheet, served by index.py under /api/static (the prefix the frontend
+# proxies). Its digest is in the URL so clients can cache it as immutable.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "static")
+with open(os.path.join(STATIC_DIR, "report.css"), "rb") as _css:
+    _REPORT_CSS_HREF = f"/api/static/report.css?v={hashlib.blake2b(_css.read(), digest_size=4).hexdigest()}"
+
+# Standalone page force_display_report wraps around the final report
+_REPORT_PAGE_HEAD = f"""
+<!DOCTYPE html>
+<html>
+<head>
+    <link rel="stylesheet" href="{_REPORT_CSS_HREF}">
+</head>
+<body>
+    <div class="report-container">
+        <div class="report-title">🚀 PERFORMANCE REPORT 🚀</div>
+        <div class="report-content">
+"""
+_REPORT_PAGE_TAIL = """
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+def _render_performance_report() -> str:
+    """Builds the HTML-wrapped report shown by display_performance_report."""
+    try:
+        # First try the most recently stored report
+        url, full_report = controller._find_latest_full_report()
+        if full_report is not None:
+            logger.info("✅ Found existing report for %s to force-display", url)
+            
+            # Use special formatting that should be visible in the UI
+            report_message = _wrap_html_report(full_report)
+            logger.debug("🚨 FORCE-DISPLAYING REPORT WITH LENGTH: %d", len(report_message))
+            return report_message
         
         # Try to generate a report if none exists
         try:
             report = show_performance_metrics()
             if report:
                 # Use special formatting that should be visible in the UI
-                report_message = f"""
-<div style="padding:20px; background:#f5f5f5; border:2px solid #ccc; border-radius:10px; margin:20px 0;">
-    <h2 style="color:#2c3e50; text-align:center; border-bottom:1px solid #ccc; padding-bottom:10px; margin-bottom:15px;">🚀 PERFORMANCE REPORT 🚀</h2>
-    <pre style="white-space:pre-wrap; font-family:monospace; background:#fff; padding:15px; border-radius:5px; font-size:14px; line-height:1.4;">
-{report}
-    </pre>
-</div>
-"""
-                print(f"🚨 FORCE-DISPLAYING GENERATED REPORT WITH LENGTH: {len(report_message)}")
+                report_message = _wrap_html_report(report)
+                logger.debug("🚨 FORCE-DISPLAYING GENERATED REPORT WITH LENGTH: %d", len(report_message))
                 return report_message
         except Exception as e:
-            logger.error(f"❌ Error generating report for force-display: {str(e)}")
+            logger.error("❌ Error generating report for force-display: %s", e)
         
         # Return a basic message if no report found
-        return """
-<div style="padding:20px; background:#f5f5f5; border:2px solid #ccc; border-radius:10px; margin:20px 0;">
-    <h2 style="color:#2c3e50; text-align:center; border-bottom:1px solid #ccc; padding-bottom:10px; margin-bottom:15px;">🚀 PERFORMANCE REPORT 🚀</h2>
-    <p style="font-size:16px; line-height:1.5; text-align:center;">
-        No performance report has been generated yet.<br/>
-        Try running "Get session exploration summary" to generate metrics.
-    </p>
-</div>
-"""
+        return _NO_REPORT_HTML
         
     except Exception as e:
-        logger.error(f"❌ Error in display_performance_report: {str(e)}")
+        logger.error("❌ Error in display_performance_report: %s", e)
         return f"""
 <div style="padding:20px; background:#f5f5f5; border:2px solid #ccc; border-radius:10px; margin:20px 0;">
     <h2 style="color:#2c3e50; text-align:center; border-bottom:1px solid #ccc; padding-bottom:10px; margin-bottom:15px;">🚀 ERROR DISPLAYING REPORT 🚀</h2>
@@ -1991,85 +2412,95 @@ def display_performance_report() -> str:
 </div>
 """
 
+def iter_report_html(report_content: str) -> Iterator[str]:
+    """Yields the standalone report page in chunks, for callers that can stream it."""
+    yield _REPORT_PAGE_HEAD
+    yield escape(report_content)
+    yield _REPORT_PAGE_TAIL
+
 def force_display_report():
     """Special function to force the display of a performance report to the UI. Called at the very end of execution."""
     try:
-        # Get the most recent report
-        report = None
         report_content = "No performance data available"
         
-        # Try to find any existing report
-        session_data = controller._get_current_session_metrics()
-        pages = session_data.get("pages", {})
-        
-        # Look for reports
-        for url, page_data in pages.items():
-            if "full_report" in page_data:
-                report = page_data["full_report"]
-                logger.info(f"✅ Found report for {url} in force_display_report")
-                break
+        # Use the most recently stored report
+        url, report = controller._find_latest_full_report()
+        if report is not None:
+            logger.info("✅ Found report for %s in force_display_report", url)
         
         # If we have a report, format it for display
         if report:
             report_content = report
         
         # Create HTML content for better visibility
-        html_content = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <style>
-        .report-container {{
-            padding: 20px;
-            background: #f5f5f5;
-            border: 2px solid #ccc;
-            border-radius: 10px;
-            margin: 20px 0;
-            font-family: Arial, sans-serif;
-        }}
-        .report-title {{
-            color: #2c3e50;
-            text-align: center;
-            border-bottom: 1px solid #ccc;
-            padding-bottom: 10px;
-            margin-bottom: 15px;
-            font-size: 20px;
-            font-weight: bold;
-        }}
-        .report-content {{
-            white-space: pre-wrap;
-            font-family: monospace;
-            background: #fff;
-            padding: 15px;
-            border-radius: 5px;
-            font-size: 14px;
-            line-height: 1.4;
-            overflow-x: auto;
-        }}
-    </style>
-</head>
-<body>
-    <div class="report-container">
-        <div class="report-title">🚀 PERFORMANCE REPORT 🚀</div>
-        <div class="report-content">
-{report_content}
-        </div>
-    </div>
-</body>
-</html>
-"""
+        html_content = "".join(iter_report_html(report_content))
         
-        # Print the HTML for debugging
-        print(f"🚨 FORCE DISPLAY REPORT HTML (LENGTH: {len(html_content)})")
-        print(f"🚨 FIRST 200 CHARS: {html_content[:200]}...")
+        # Log the HTML for debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("🚨 FORCE DISPLAY REPORT HTML (LENGTH: %d)", len(html_content))
+            logger.debug("🚨 FIRST 200 CHARS: %s...", html_content[:200])
         
         # Return the formatted HTML
         return html_content
         
     except Exception as e:
-        logger.error(f"❌ Error in force_display_report: {str(e)}")
+        logger.error("❌ Error in force_display_report: %s", e)
         return f"Error displaying performance report: {str(e)}"
 
+class _BatchSession:
+    """
+    Owns a batch run's browser: creates it with monitoring installed on enter, and on
+    exit closes it and drops everything the run registered for the session.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.cdp_url = _CDP_BASE + quote_plus(session_id)
+        self.browser: Optional[Browser] = None
+        self.browser_context: Optional[BrowserContext] = None
+
+    async def __aenter__(self) -> "_BatchSession":
+        # Create a new browser instance (always new for batch mode)
+        logger.info("🌐 Creating new browser for batch session: %s", self.session_id)
+        try:
+            self.browser = Browser(BrowserConfig(cdp_url=self.cdp_url))
+            # Use our custom browser context
+            self.browser_context = BrowserContext(browser=self.browser)
+
+            # Store for use during this batch session
+            browser_sessions.add(self.session_id, self.browser, self.browser_context)
+
+            # Set up monitoring hooks
+            await setup_browser_monitoring_hooks(self.browser_context)
+            await _install_collectors(self.browser_context)
+        except BaseException:
+            # __aexit__ doesn't run when entering fails
+            await self.close()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def close(self):
+        # Close browser and clean up resources
+        try:
+            if self.browser:
+                await self.browser.close()
+                logger.info("✅ Browser closed for batch session %s", self.session_id)
+        except Exception as e:
+            logger.error("❌ Error closing browser: %s", e)
+
+        # Remove from active browsers
+        browser_sessions.remove(self.session_id)
+
+        # Batch sessions are not resumed, so drop their controller state
+        controller.drop_session(self.session_id)
+        logger.info("✅ Cleared controller state for session %s", self.session_id)
+
+        # Reports only reference the stored text metrics, so the screenshots can go
+        await _clear_session_screenshots(self.session_id)
+
 async def browser_use_agent_batch(
     model_config: ModelConfig,
     agent_settings: AgentSettings,
@@ -2080,191 +2511,149 @@ async def browser_use_agent_batch(
     Non-streaming version of browser_use_agent that runs autonomously
     and returns the final report as a single string.
     """
-    global _agent_resumed
     global session_metrics_storage
     
     logger.info("🚀 Starting browser_use_agent_batch with session_id: %s", session_id)
-    logger.info("🔧 Model config: %s", model_config)
-    logger.info("⚙️ Agent settings: %s", agent_settings)
+    # The full settings include the system prompt, so only dump them at debug level
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🔧 Model config: %s", model_config)
+        logger.debug("⚙️ Agent settings: %s", agent_settings)
 
     # Data collection container instead of a queue
-    collected_data = {
-        "metrics": {},
-        "anomalies": {},
-        "screenshots": {},
-        "final_report": None,
-        "memory": None,
-        "goals": []
-    }
+    collected = StepCollected()
 
     # --- Robust History Check ---
-    if not history:
-        logger.error("❌ Error in browser_use_agent_batch: History list is empty.")
-        return "Error: Task history is empty."
-    if not isinstance(history[-1], dict):
-        logger.error(f"❌ Error in browser_use_agent_batch: Last history item is not a dictionary. Got: {type(history[-1])}")
-        return f"Error: Invalid history format (last item type: {type(history[-1])})."
-    if "content" not in history[-1]:
-        logger.error(f"❌ Error in browser_use_agent_batch: Last history item is missing 'content' key. Got keys: {history[-1].keys()}")
-        return "Error: Invalid history format (missing 'content' key)."
-    if not isinstance(history[-1]["content"], str):
-        logger.error(f"❌ Error in browser_use_agent_batch: History 'content' is not a string. Got type: {type(history[-1]['content'])}")
-        return f"Error: Invalid history format (content type: {type(history[-1]['content'])})."
-
-    task_description = history[-1]["content"]
-    logger.info(f"✅ Extracted task description: {task_description[:100]}...")
+    try:
+        task_description = history[-1]["content"]
+        if not isinstance(task_description, str):
+            raise TypeError(f"history content is {type(task_description).__name__}, not str")
+    except (IndexError, KeyError, TypeError) as e:
+        logger.error("❌ Error in browser_use_agent_batch: Invalid task history: %r", e)
+        return f"Error: Invalid history format ({e!r})."
+    logger.info("✅ Extracted task description: %s...", task_description[:100])
     # --- End Robust History Check ---
 
-    # Reset static variables for yield_data function
-    if hasattr(yield_data, "_done_processed"):
-        yield_data._done_processed = False
-        logger.info("🔄 Reset yield_data._done_processed flag")
-
     # Clear previous metrics for this session ID at the start of a new run
     if session_id in session_metrics_storage:
         logger.info("🧹 Clearing previous session metrics for session_id: %s", session_id)
-        del session_metrics_storage[session_id]
-    # Re-initialize defaultdict entry
-    session_metrics_storage[session_id]
+    session_metrics_storage[session_id] = SessionMetrics()
+    await _clear_session_screenshots(session_id)
 
     llm, use_vision = create_llm(model_config)
     logger.info("🤖 Created LLM instance")
 
-    # Set the session_id in the controller
-    controller.set_session_id(session_id) # This will also ensure the session exists in storage
-    
-    # Explicitly reset the finished flag for this run
-    controller.finished = False
-    logger.info("🔄 Explicitly reset controller.finished flag for new agent run")
+    # Bind the session to this task; this also resets its finished flag
+    session = controller.set_session_id(session_id) # This will also ensure the session exists in storage
     
     # Reset the resumed flag at the start of a new session
-    _agent_resumed = False
-
-    browser = None
-    browser_context = None
+    session.set_resumed(False)
 
     try:
-        # Create a new browser instance (always new for batch mode)
-        logger.info("🌐 Creating new browser for batch session: %s", session_id)
-        browser = Browser(
-            BrowserConfig(
-                cdp_url=f"{STEEL_CONNECT_URL}?apiKey={STEEL_API_KEY}&sessionId={session_id}"
-            )
-        )
-        # Use our custom browser context
-        browser_context = BrowserContext(browser=browser)
-        
-        # Store for use during this batch session
-        active_browsers[session_id] = browser
-        active_browser_contexts[session_id] = browser_context
-        
-        # Set up monitoring hooks
-        await setup_browser_monitoring_hooks(browser_context)
+        async with _BatchSession(session_id) as batch:
+            # Define batch-specific callbacks
+            def batch_yield_data(browser_state, agent_output, step_number):
+                """Callback for each step - store data instead of yielding"""
+                try:
+                    logger.info("🔄 batch_yield_data called for step %s", step_number)
+                    current_state = agent_output.current_state
+                    goals = collected.goals
+
+                    # Store memory if available
+                    if current_state.memory:
+                        collected.memory = current_state.memory
+                        logger.info("✅ Stored memory")
+
+                    # Store previous goal
+                    if step_number > 2 and current_state.evaluation_previous_goal:
+                        goals.append({
+                            "type": "previous",
+                            "content": current_state.evaluation_previous_goal,
+                            "step": step_number
+                        })
+                        logger.info("✅ Stored previous goal")
+
+                    # Store next goal
+                    if current_state.next_goal:
+                        goals.append({
+                            "type": "next",
+                            "content": current_state.next_goal,
+                            "step": step_number
+                        })
+                        logger.info("✅ Stored next goal")
 
-        # Define batch-specific callbacks
-        def batch_yield_data(browser_state, agent_output, step_number):
-            """Callback for each step - store data instead of yielding"""
-            try:
-                logger.info(f"🔄 batch_yield_data called for step {step_number}")
-                
-                # Store memory if available
-                if agent_output.current_state.memory:
-                    collected_data["memory"] = agent_output.current_state.memory
-                    logger.info("✅ Stored memory")
-                
-                # Store previous goal
-                if step_number > 2 and agent_output.current_state.evaluation_previous_goal:
-                    collected_data["goals"].append({
-                        "type": "previous",
-                        "content": agent_output.current_state.evaluation_previous_goal,
-                        "step": step_number
-                    })
-                    logger.info("✅ Stored previous goal")
-                
-                # Store next goal
-                if agent_output.current_state.next_goal:
-                    collected_data["goals"].append({
-                        "type": "next",
-                        "content": agent_output.current_state.next_goal,
-                        "step": step_number
-                    })
-                    logger.info("✅ Stored next goal")
-                
-                # Check for done action
-                for action_model in agent_output.action:
-                    for key, value in action_model.model_dump().items():
-                        if key == "done" and value:
-                            # Set controller as finished
-                            controller.finished = True
-                            logger.info("✅ Marked agent as finished from batch_yield_data")
-                
-            except Exception as e:
-                logger.error(f"❌ Error in batch_yield_data: {str(e)}")
+                    # Check for done action
+                    if any(_is_done_action(action_model) for action_model in agent_output.action):
+                        # Set controller as finished
+                        controller.finished = True
+                        logger.info("✅ Marked agent as finished from batch_yield_data")
 
-        def batch_yield_done(history):
-            """Callback when the agent completes - generate and store final report"""
-            try:
-                logger.info("✅ Agent completed task, generating final report")
-                
-                # Mark controller as finished
-                controller.finished = True
-                
-                # Generate the report
+                except Exception as e:
+                    logger.error("❌ Error in batch_yield_data: %s", e)
+
+            def batch_yield_done(history):
+                """Callback when the agent completes - generate and store final report"""
                 try:
-                    report = display_performance_report()
-                    collected_data["final_report"] = report
-                    logger.info("📊 Generated and stored final performance report")
+                    logger.info("✅ Agent completed task, generating final report")
+
+                    # Mark controller as finished
+                    controller.finished = True
+
+                    # Generate the report
+                    try:
+                        report = display_performance_report()
+                        collected.final_report = report
+                        logger.info("📊 Generated and stored final performance report")
+                    except Exception as e:
+                        logger.error("❌ Error generating report in batch_yield_done: %s", e)
+                        # Create a basic report on error
+                        collected.final_report = f"Error generating final report: {str(e)}"
+
                 except Exception as e:
-                    logger.error(f"❌ Error generating report in batch_yield_done: {str(e)}")
-                    # Create a basic report on error
-                    collected_data["final_report"] = f"Error generating final report: {str(e)}"
-                
-            except Exception as e:
-                logger.error(f"❌ Error in batch_yield_done: {str(e)}")
-
-        # Create agent with batch callbacks
-        agent = Agent(
-            llm=llm,
-            task=history[-1]["content"],
-            controller=controller,
-            browser=browser,
-            browser_context=browser_context,
-            generate_gif=False,
-            use_vision=use_vision,
-            register_new_step_callback=batch_yield_data,
-            register_done_callback=batch_yield_done,
-            system_prompt_class=ExtendedSystemPrompt,
-        )
-        logger.info("🌐 Created Agent with browser instance for batch mode (use_vision=%s)", use_vision)
+                    logger.error("❌ Error in batch_yield_done: %s", e)
+
+            # Create agent with batch callbacks
+            agent = Agent(
+                llm=llm,
+                task=history[-1]["content"],
+                controller=controller,
+                browser=batch.browser,
+                browser_context=batch.browser_context,
+                generate_gif=False,
+                use_vision=use_vision,
+                register_new_step_callback=batch_yield_data,
+                register_done_callback=batch_yield_done,
+                system_prompt_class=ExtendedSystemPrompt,
+            )
+            logger.info("🌐 Created Agent with browser instance for batch mode (use_vision=%s)", use_vision)
 
-        # Set the agent in the controller
-        controller.set_agent(agent)
+            # Set the agent in the controller
+            controller.set_agent(agent)
 
-        # Get steps from settings
-        steps = agent_settings.steps or 25
-        logger.info(f"▶️ Running batch agent with {steps} steps using task: {task_description[:100]}...") # Log task usage
+            # Get steps from settings
+            steps = agent_settings.steps or 25
+            logger.info("▶️ Running batch agent with %d steps using task: %s...", steps, task_description[:100]) # Log task usage
+
+            # Run the agent and wait for completion
+            await agent.run(steps)
+            logger.info("✅ Agent run completed")
+
+            # Ensure we have a final report
+            if not collected.final_report:
+                logger.info("📊 Generating final report after agent completion")
+                try:
+                    # Use our existing report generation function
+                    collected.final_report = force_display_report()
+                except Exception as e:
+                    logger.error("❌ Error generating force_display_report: %s", e)
+                    collected.final_report = "Error generating performance report after completion."
+
+            # Return the final report
+            logger.info("📄 Returning final report (length: %d)", 
+                        len(collected.final_report) if collected.final_report else 0)
+            return collected.final_report
 
-        # Run the agent and wait for completion
-        await agent.run(steps)
-        logger.info("✅ Agent run completed")
-        
-        # Ensure we have a final report
-        if not collected_data["final_report"]:
-            logger.info("📊 Generating final report after agent completion")
-            try:
-                # Use our existing report generation function
-                collected_data["final_report"] = force_display_report()
-            except Exception as e:
-                logger.error(f"❌ Error generating force_display_report: {str(e)}")
-                collected_data["final_report"] = "Error generating performance report after completion."
-        
-        # Return the final report
-        logger.info("📄 Returning final report (length: %d)", 
-                    len(collected_data["final_report"]) if collected_data["final_report"] else 0)
-        return collected_data["final_report"]
-        
     except Exception as e:
-        logger.error(f"❌ Error in browser_use_agent_batch: {str(e)}")
+        logger.error("❌ Error in browser_use_agent_batch: %s", e)
         error_report = f"Error during batch execution: {str(e)}\n\n"
         
         # Try to get a basic report even on error
@@ -2277,26 +2666,4 @@ async def browser_use_agent_batch(
         return error_report
         
     finally:
-        # Close browser and clean up resources
-        try:
-            if browser:
-                await browser.close()
-                logger.info(f"✅ Browser closed for batch session {session_id}")
-        except Exception as e:
-            logger.error(f"❌ Error closing browser: {str(e)}")
-        
-        # Remove from active browsers dictionary
-        if session_id in active_browsers:
-            del active_browsers[session_id]
-            logger.info(f"✅ Removed session {session_id} from active_browsers")
-            
-        if session_id in active_browser_contexts:
-            del active_browser_contexts[session_id]
-            logger.info(f"✅ Removed session {session_id} from active_browser_contexts")
-        
-        # Reset controller status for this session
-        if controller.session_id == session_id:
-            controller.finished = False
-            logger.info(f"✅ Reset controller.finished for session {session_id}")
-        
-        logger.info(f"✅ Batch agent execution complete for session {session_id}")
\ No newline at end of file
+        logger.info("✅ Batch agent execution complete for session %s", session_id)
\ No newline at end of file
@@ -7,9 +7,11 @@ from .models import ModelConfig, ModelProvider
 from typing import Sequence, Union, Dict, Type, Callable, Any
 from langchain_core.tools import BaseTool
 from langchain_anthropic.chat_models import convert_to_anthropic_tool
-from functools import cached_property
+from functools import cache, cached_property
 import anthropic
+import hashlib
 import os
+from cachetools import LRUCache
 from langchain_google_genai import ChatGoogleGenerativeAI
 from pydantic import SecretStr
 
@@ -50,65 +52,125 @@ class BetaChatAnthropic(ChatAnthropic):
         return super().bind(tools=anthropic_tools, **kwargs)
 
 
+# Built LLMs keyed by the config fields that shape them, so identical configs share one
+# client and its connection pool instead of constructing a new SDK client per session
+_llm_cache: LRUCache = LRUCache(maxsize=32)
+
+
+def _llm_cache_key(config: ModelConfig) -> tuple:
+    # Only a digest of the API key is kept in the key
+    api_key_digest = (
+        hashlib.blake2b(config.api_key.encode(), digest_size=8).digest()
+        if config.api_key else None
+    )
+    return (
+        config.provider,
+        config.model_name,
+        config.temperature,
+        config.max_tokens,
+        api_key_digest,
+        frozenset(config.extra_params.items()),
+    )
+
+
 def create_llm(config: ModelConfig) -> tuple[BaseChatModel | Client, bool]:
     """
     Returns a tuple containing:
     1. The appropriate LangChain LLM object based on the ModelConfig provider
     2. A boolean indicating whether vision should be used (False for DeepSeek, True for others)
     """
-    if config.provider == ModelProvider.AZURE_OPENAI:
-        return AzureChatOpenAI(
-            azure_deployment=config.model_name or "gpt-4o-mini",
-            temperature=config.temperature,
-            max_tokens=config.max_tokens,
-            openai_api_key=(
-                os.getenv("AZURE_OPENAI_API_KEY") if not config.api_key else config.api_key
-            ),
-            openai_api_version=os.getenv("OPENAI_API_VERSION", "2025-01-01-preview"),
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT", ""),
-            **config.extra_params,
-        ), True
-    elif config.provider == ModelProvider.OPENAI:
-        return ChatOpenAI(
-            model_name=config.model_name or "gpt-4o-mini",
-            temperature=config.temperature,
-            max_tokens=config.max_tokens,
-            api_key=(
-                os.getenv("OPENAI_API_KEY") if not config.api_key else config.api_key
-            ),
-            **config.extra_params,
-        ), True
-    
-    elif config.provider == ModelProvider.ANTHROPIC:
-        return ChatAnthropic(
-            model=config.model_name or "claude-3-7-sonnet-latest",
-            max_tokens_to_sample=config.max_tokens,
-            temperature=config.temperature,
-            api_key=(
-                os.getenv("ANTHROPIC_API_KEY") if not config.api_key else config.api_key
-            ),
-            **config.extra_params,
-        ), True
-    elif config.provider == ModelProvider.GEMINI:
-        return ChatGoogleGenerativeAI(
-            model=config.model_name or "gemini-2.0-flash",
-            temperature=config.temperature,
-            max_output_tokens=config.max_tokens,
-            google_api_key=(
-                os.getenv("GOOGLE_API_KEY") if not config.api_key else config.api_key
-            ),
-            **config.extra_params,
-        ), True
-    elif config.provider == ModelProvider.DEEPSEEK:
-        api_key = config.api_key or os.getenv("DEEPSEEK_API_KEY", "")
-        
-        return ChatOpenAI(
-            base_url="https://api.deepseek.com/v1",
-            model_name=config.model_name or "deepseek-chat",
-            temperature=config.temperature,
-            max_tokens=config.max_tokens,
-            api_key=SecretStr(api_key),
-            **config.extra_params,
-        ), False
-    else:
-        raise ValueError(f"Unsupported provider: {config.provider}")
+    try:
+        key = _llm_cache_key(config)
+        cached = _llm_cache.get(key)
+    except TypeError:
+        # Unhashable extra params; build without caching
+        return _build_llm(config)
+    if cached is None:
+        cached = _llm_cache[key] = _build_llm(config)
+    return cached
+
+
+@cache
+def _env(name: str, default: str | None = None) -> str | None:
+    # Resolved on first use rather than at import, since providers is imported
+    # before index.py/agent.py run load_dotenv(".env.local")
+    return os.getenv(name, default)
+
+
+def _key(explicit: str | None, env_name: str, default: str | None = None) -> SecretStr | None:
+    # The request's key wins over the environment; wrapped so reprs and logs mask it
+    value = explicit or _env(env_name, default)
+    return SecretStr(value) if value is not None else None
+
+
+def _build_azure_openai(config: ModelConfig) -> tuple[BaseChatModel, bool]:
+    return AzureChatOpenAI(
+        azure_deployment=config.model_name or "gpt-4o-mini",
+        temperature=config.temperature,
+        max_tokens=config.max_tokens,
+        openai_api_key=_key(config.api_key, "AZURE_OPENAI_API_KEY"),
+        openai_api_version=_env("OPENAI_API_VERSION", "2025-01-01-preview"),
+        azure_endpoint=_env("AZURE_OPENAI_ENDPOINT", ""),
+        **config.extra_params,
+    ), True
+
+
+def _build_openai(config: ModelConfig) -> tuple[BaseChatModel, bool]:
+    return ChatOpenAI(
+        model_name=config.model_name or "gpt-4o-mini",
+        temperature=config.temperature,
+        max_tokens=config.max_tokens,
+        api_key=_key(config.api_key, "OPENAI_API_KEY"),
+        **config.extra_params,
+    ), True
+
+
+def _build_anthropic(config: ModelConfig) -> tuple[BaseChatModel, bool]:
+    return ChatAnthropic(
+        model=config.model_name or "claude-3-7-sonnet-latest",
+        max_tokens_to_sample=config.max_tokens,
+        temperature=config.temperature,
+        api_key=_key(config.api_key, "ANTHROPIC_API_KEY"),
+        **config.extra_params,
+    ), True
+
+
+def _build_gemini(config: ModelConfig) -> tuple[BaseChatModel, bool]:
+    return ChatGoogleGenerativeAI(
+        model=config.model_name or "gemini-2.0-flash",
+        temperature=config.temperature,
+        max_output_tokens=config.max_tokens,
+        google_api_key=_key(config.api_key, "GOOGLE_API_KEY"),
+        **config.extra_params,
+    ), True
+
+
+def _build_deepseek(config: ModelConfig) -> tuple[BaseChatModel, bool]:
+    return ChatOpenAI(
+        base_url="https://api.deepseek.com/v1",
+        model_name=config.model_name or "deepseek-chat",
+        temperature=config.temperature,
+        max_tokens=config.max_tokens,
+        api_key=_key(config.api_key, "DEEPSEEK_API_KEY", ""),
+        **config.extra_params,
+    ), False
+
+
+# Builder per provider; each returns (llm, use_vision)
+_PROVIDER_BUILDERS: Dict[ModelProvider, Callable[[ModelConfig], tuple[BaseChatModel, bool]]] = {
+    ModelProvider.AZURE_OPENAI: _build_azure_openai,
+    ModelProvider.OPENAI: _build_openai,
+    ModelProvider.ANTHROPIC: _build_anthropic,
+    ModelProvider.GEMINI: _build_gemini,
+    ModelProvider.DEEPSEEK: _build_deepseek,
+}
+
+
+def _build_llm(config: ModelConfig) -> tuple[BaseChatModel | Client, bool]:
+    # ModelProvider(...) also accepts the plain string values, which hash differently
+    # from the enum members
+    try:
+        builder = _PROVIDER_BUILDERS[ModelProvider(config.provider)]
+    except (ValueError, KeyError):
+        raise ValueError(f"Unsupported provider: {config.provider}") from None
+    return builder(config)
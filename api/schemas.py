@@ -2,6 +2,7 @@ from api.plugins import WebAgentType
 from .utils.prompt import ClientMessage
 from pydantic import BaseModel
 from typing import List, Optional
+from datetime import datetime
 from .models import ModelProvider
 from .utils.types import AgentSettings, ModelSettings
 
@@ -36,8 +37,8 @@ class TestResponse(BaseModel):
     description: Optional[str] = None
     status: str
     user_id: str
-    created_at: Optional[str] = None
-    updated_at: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
     error: Optional[str] = None
 
 
@@ -55,8 +56,8 @@ class ReportResponse(BaseModel):
     content: str
     status: str
     user_id: str
-    created_at: Optional[str] = None
-    updated_at: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
 
 class BatchAgentRequest(BaseModel):